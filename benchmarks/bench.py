@@ -0,0 +1,418 @@
+"""
+Benchmarks for the simulation, rendering and map loading code.
+
+Run from anywhere with `python benchmarks/bench.py`. Results can be saved as JSON with `--save`
+and compared against an earlier run with `--baseline`, which flags every benchmark that got
+slower than the threshold and exits with status 1 if any did.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)  # Assets and maps are loaded with paths relative to the repository root
+sys.path.insert(0, ROOT)
+
+import pygame as pg
+
+from main import Game
+from scripts.batch import MobBatch, BATCH_TYPES
+from scripts.clouds import cloud_layers
+from scripts.parallax import Parallax
+from scripts.tilemap import Tilemap, BINARY_MAP_EXTENSION
+from scripts.utils import assets
+
+MAPS = ["maps/map1.json", "maps/map2.json", "maps/map3.json", "maps/testmap.json"]
+# How many times the synthetic maps repeat map2 side by side, tiles and mobs included
+SYNTHETIC_SCALES = [10, 100]
+# Fewest ticks simulated on a synthetic map, so its timing is not mostly noise and fixed costs
+SYNTHETIC_MIN_TICKS = 60
+REPEAT = 5  # Every benchmark is timed this many times and the fastest run is kept
+
+
+def make_synthetic_map(source, scale, directory):
+    """
+    Writes a map made of `scale` copies of another map placed side by side.
+
+    Args:
+        source (str): The path of the map to copy.
+        scale (int): How many copies to place.
+        directory (str): The folder to write the new map to.
+
+    Returns:
+        str: The path of the new map.
+    """
+    with open(source) as f:
+        data = json.load(f)
+
+    width = max(tile["pos"][0] for tile in data["tilemap"].values()) + 1
+    tilemap, offgrid = {}, []
+    for copy in range(scale):
+        dx = copy * width
+        for tile in data["tilemap"].values():
+            pos = [tile["pos"][0] + dx, tile["pos"][1]]
+            tilemap[str(pos[0]) + ";" + str(pos[1])] = {"type": tile["type"], "pos": pos}
+        for tile in data["offgrid"]:
+            offgrid.append({"type": tile["type"], "pos": [tile["pos"][0] + dx * data["tilesize"], tile["pos"][1]]})
+
+    path = os.path.join(directory, f"synthetic_{scale}x.json")
+    with open(path, "w") as f:
+        json.dump({"tilemap": tilemap, "tilesize": data["tilesize"], "offgrid": offgrid}, f)
+    return path
+
+
+def drive(game, tick):
+    """Returns the inputs used on a given tick: hold right and jump every 40 ticks."""
+    return ("right", "jump") if tick % 40 == 0 else ("right",)
+
+
+def time_it(func, ops):
+    """
+    Times a benchmark body.
+
+    Args:
+        func (callable): The benchmark body, called once per run.
+        ops (int): How many operations one call of `func` performs.
+
+    Returns:
+        dict: The fastest time per operation in seconds and the number of operations timed.
+    """
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return {"seconds_per_op": best / ops, "ops": ops}
+
+
+def micro_benchmarks(directory, wanted):
+    """
+    Yields the micro-benchmarks as (name, body, ops) tuples.
+
+    Only the benchmarks `wanted` picks are set up, and the shared game is only made if one needs it.
+
+    Args:
+        directory (str): A folder for the binary copies of the maps.
+        wanted (callable): Returns whether a benchmark, given its name, should be run.
+    """
+    games = []
+
+    def shared_tilemap():
+        """
+        Returns the tilemap of a headless game with map2 loaded, made the first time it is asked for.
+
+        The game also opens the display that assets are converted for.
+        """
+        if not games:
+            games.append(new_game("maps/map2.json"))
+        return games[0].tilemap
+
+    rng = random.Random(0)
+    positions = [(rng.uniform(0, 2000), rng.uniform(0, 200)) for _ in range(1000)]
+    offsets = [(x, 0) for x in range(0, 2000, 20)]
+    surf = pg.Surface((320, 240))
+
+    if wanted("tilemap.tiles_around"):
+        tilemap = shared_tilemap()
+
+        def tiles_around():
+            for pos in positions:
+                tilemap.tiles_around(pos)
+        yield "tilemap.tiles_around", tiles_around, len(positions)
+
+    if wanted("tilemap.physics_rects_around"):
+        tilemap = shared_tilemap()
+
+        def physics_rects_around():
+            for pos in positions:
+                tilemap.physics_rects_around(pos)
+        yield "tilemap.physics_rects_around", physics_rects_around, len(positions)
+
+    if wanted("tilemap.physics_rects_in"):
+        tilemap = shared_tilemap()
+        # The box a 14x14 mob sweeps falling 3 pixels
+        areas = [pg.Rect(x, y, 14, 17) for x, y in positions]
+
+        def physics_rects_in():
+            for area in areas:
+                tilemap.physics_rects_in(area)
+        yield "tilemap.physics_rects_in", physics_rects_in, len(areas)
+
+    if wanted("entity.update"):
+        tilemap = shared_tilemap()
+        game = games[0]
+        game.spawn_mobs(float("-inf"), float("inf"))
+        mobs = list(game.harmfull_mobs)
+
+        def entity_update():
+            for mob in mobs:
+                mob.update(tilemap)
+        yield "entity.update", entity_update, len(mobs)
+
+    if wanted("tilemap.render"):
+        tilemap = shared_tilemap()
+
+        def render():
+            for offset in offsets:
+                tilemap.render(surf, offset)
+        yield "tilemap.render", render, len(offsets)
+
+    if wanted("tilemap.render_cold"):
+        tilemap = shared_tilemap()
+
+        def render_cold():
+            for offset in offsets:
+                tilemap.invalidate_chunks()
+                tilemap.render(surf, offset)
+        yield "tilemap.render_cold", render_cold, len(offsets)
+
+    if wanted("tilemap.render_decorated"):
+        # The same map strewn with decorations along a much longer level, most of them out of view
+        decorated = Tilemap(shared_tilemap().game)
+        decorated.load("maps/map2.json")
+        for _ in range(5000):
+            decorated.add_offgrid(rng.choice(["bush1", "bushes", "flower1"]), (rng.uniform(0, 50000), rng.uniform(0, 200)))
+
+        def render_decorated():
+            for offset in offsets:
+                decorated.render(surf, offset)
+        yield "tilemap.render_decorated", render_decorated, len(offsets)
+
+    if wanted("parallax.render"):
+        shared_tilemap()
+        # A backdrop with ten times the game's clouds, scrolling and drifting every frame. The game redraws
+        # the whole display when the camera moves, so nothing is tracked
+        backdrop = Parallax(assets["background"], cloud_layers(assets["clouds"], surf.get_size(), count=60))
+
+        def backdrop_render():
+            for offset in offsets:
+                backdrop.update()
+                backdrop.render(surf, offset, track=False)
+        yield "parallax.render", backdrop_render, len(offsets)
+
+    if MobBatch.available and wanted("tilemap.set_tile_batched"):
+        # Switching cells with a mob batch that has stepped listening, so every change also updates its solid grid
+        batched = new_game("maps/map2.json", batch_physics=True)
+        batched.spawn_mobs(float("-inf"), float("inf"))
+        batched.batch.step([mob for mob in batched.harmfull_mobs if mob.type in BATCH_TYPES])
+        cells = [pos for pos, _ in batched.tilemap.iter_tiles()][:100]
+
+        def set_tile_batched():
+            for pos in cells:
+                batched.tilemap.set_tile(pos, "random2")
+                batched.tilemap.set_tile(pos, "brick")
+        yield "tilemap.set_tile_batched", set_tile_batched, 2 * len(cells)
+
+    if wanted("animation.img"):
+        shared_tilemap()
+        animation = assets["goomba/run"].copy()
+
+        def animation_img():
+            for _ in range(1000):
+                animation.update()
+                animation.img(True)
+        yield "animation.img", animation_img, 1000
+
+    for path in MAPS:
+        name = os.path.basename(path)
+        binary = os.path.join(directory, os.path.splitext(name)[0] + BINARY_MAP_EXTENSION)
+        if not (wanted(f"tilemap.load/{name}") or wanted(f"tilemap.load/{os.path.basename(binary)}")):
+            continue
+        loader = Tilemap(None)
+        if wanted(f"tilemap.load/{name}"):
+            yield f"tilemap.load/{name}", lambda path=path, loader=loader: loader.load(path), 1
+
+        if wanted(f"tilemap.load/{os.path.basename(binary)}"):
+            # The same map in the binary format
+            loader.load(path)
+            loader.save(binary)
+            yield f"tilemap.load/{os.path.basename(binary)}", lambda binary=binary, loader=loader: loader.load(binary), 1
+
+
+def crowd_benchmarks(path, wanted):
+    """
+    Yields benchmarks that move every goomba and koopa of a map at once, one by one and batched.
+
+    Args:
+        path (str): The map to spawn the crowd from.
+        wanted (callable): Returns whether a benchmark, given its name, should be run.
+    """
+    if not (wanted("crowd.update") or wanted("crowd.batch")):
+        return
+    game = new_game(path)
+    game.spawn_mobs(float("-inf"), float("inf"))
+    mobs = [mob for mob in game.harmfull_mobs if mob.type in BATCH_TYPES]
+
+    def update():
+        for mob in mobs:
+            mob.update(game.tilemap)
+    if wanted("crowd.update"):
+        yield "crowd.update", update, len(mobs)
+
+    if MobBatch.available and wanted("crowd.batch"):
+        batch = MobBatch(game.tilemap)
+        yield "crowd.batch", lambda: batch.step(mobs), len(mobs)
+
+
+def stream_benchmarks(path, directory, wanted):
+    """
+    Yields a benchmark that scrolls a streamed window across a whole map, one screen at a time.
+
+    Args:
+        path (str): The JSON map to stream, converted to the binary format first.
+        directory (str): The folder to write the binary map to.
+        wanted (callable): Returns whether a benchmark, given its name, should be run.
+    """
+    if not wanted("tilemap.update_stream"):
+        return
+    binary = os.path.join(directory, os.path.splitext(os.path.basename(path))[0] + BINARY_MAP_EXTENSION)
+    loader = Tilemap(None)
+    loader.load(path)
+    loader.save(binary)
+    game = new_game(binary, stream=True)
+    tilemap = game.tilemap
+    width = game.display.get_width()
+    positions = range(0, tilemap.level.grid_w * tilemap.tile_size, width)
+
+    def sweep():
+        for x in positions:
+            tilemap.update_stream(x, x + width)
+    yield "tilemap.update_stream", sweep, len(positions)
+
+
+def macro_benchmarks(maps, ticks, wanted):
+    """
+    Yields the macro scenarios as (name, body, ops) tuples.
+
+    Each scenario builds a fresh headless game per run, so the timing includes only the ticks.
+
+    Args:
+        maps (list): The paths of the maps to simulate.
+        ticks (dict): The number of ticks to simulate, by map path.
+        wanted (callable): Returns whether a benchmark, given its name, should be run.
+    """
+    for path in maps:
+        name = os.path.splitext(os.path.basename(path))[0]
+        count = ticks[path]
+
+        def simulate(path=path, count=count):
+            game = new_game(path)
+            start = time.perf_counter()
+            for tick in range(count):
+                game.step(drive(game, tick))
+            return time.perf_counter() - start
+        if wanted(f"sim/{name}"):
+            yield f"sim/{name}", simulate, count
+
+        def frames(path=path, count=count):
+            game = new_game(path)
+            start = time.perf_counter()
+            for tick in range(count):
+                game.step(drive(game, tick))
+                render_scroll = (int(game.scroll[0]), int(game.scroll[1]))
+                game.render(render_scroll)
+                game.presenter.draw(game.display)
+            return time.perf_counter() - start
+        if wanted(f"frame/{name}"):
+            yield f"frame/{name}", frames, count
+
+
+def new_game(path, stream=False, batch_physics=False):
+    """Creates a headless game on a map with a fixed random seed."""
+    random.seed(0)
+    return Game(path, headless=True, batch_physics=batch_physics, stream=stream)
+
+
+def time_scenario(func, ops):
+    """Like time_it, but for bodies that time themselves and return the elapsed seconds."""
+    best = min(func() for _ in range(REPEAT))
+    return {"seconds_per_op": best / ops, "ops": ops}
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares results against a baseline.
+
+    Args:
+        results (dict): The benchmark results of this run.
+        baseline (dict): The benchmark results of an earlier run.
+        threshold (float): The allowed slowdown, 0.2 meaning 20% slower.
+
+    Returns:
+        list: The names of the benchmarks that got slower than the threshold.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["seconds_per_op"] / baseline[name]["seconds_per_op"]
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:40} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare the results against this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown counted as a regression, 0.2 means 20%% (default: %(default)s)")
+    parser.add_argument("--ticks", type=int, default=600, help="ticks per macro scenario on the shipped maps")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this text")
+    args = parser.parse_args()
+
+    def wanted(name):
+        return args.filter in name
+
+    with tempfile.TemporaryDirectory() as directory:
+        benchmarks = [(name, func, ops, time_it) for name, func, ops in micro_benchmarks(directory, wanted)]
+
+        # The synthetic maps are only written if a benchmark on them is run. The crowd and streaming
+        # benchmarks use the largest one
+        largest = SYNTHETIC_SCALES[-1]
+        needs_largest = any(wanted(name) for name in ("crowd.update", "crowd.batch", "tilemap.update_stream"))
+        synthetic = {}
+        for scale in SYNTHETIC_SCALES:
+            name = f"synthetic_{scale}x"
+            if wanted(f"sim/{name}") or wanted(f"frame/{name}") or (scale == largest and needs_largest):
+                synthetic[scale] = make_synthetic_map("maps/map2.json", scale, directory)
+
+        maps = MAPS + list(synthetic.values())
+        # Keep the synthetic scenarios short, their cost per tick grows with the mob count
+        ticks = {path: args.ticks for path in MAPS}
+        ticks.update({path: max(SYNTHETIC_MIN_TICKS, args.ticks // scale) for scale, path in synthetic.items()})
+        if largest in synthetic:
+            benchmarks += [(name, func, ops, time_it) for name, func, ops in crowd_benchmarks(synthetic[largest], wanted)]
+            benchmarks += [(name, func, ops, time_it)
+                           for name, func, ops in stream_benchmarks(synthetic[largest], directory, wanted)]
+        benchmarks += [(name, func, ops, time_scenario) for name, func, ops in macro_benchmarks(maps, ticks, wanted)]
+
+        results = {}
+        for name, func, ops, timer in benchmarks:
+            results[name] = timer(func, ops)
+            print(f"{name:40} {results[name]['seconds_per_op'] * 1e6:12.2f} us/op")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"meta": {"python": platform.python_version(), "pygame": pg.version.ver,
+                                "machine": platform.machine(), "time": time.time()},
+                       "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        print()
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Converts maps between the JSON format and the binary map format.
+
+The output format is picked from the output file's extension, so
+`python convert_map.py maps/map1.json maps/map1.bmap` writes a binary map and
+`python convert_map.py maps/map1.bmap map1.json` turns it back into JSON.
+"""
+import argparse
+
+from scripts.tilemap import Tilemap
+
+
+def convert(source, destination):
+    """
+    Loads a map in either format and saves it in the format matching the destination's extension.
+
+    Args:
+        source (str): The path of the map to read.
+        destination (str): The path to write the converted map to.
+
+    Returns:
+        Tilemap: The loaded tilemap.
+    """
+    # Loading and saving never touch the game, so the tilemap needs no game instance
+    tilemap = Tilemap(None)
+    tilemap.load(source)
+    tilemap.save(destination)
+    return tilemap
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", help="the map to convert, JSON or binary")
+    parser.add_argument("destination", help="where to write the map, binary if it ends in .bmap, else JSON")
+    args = parser.parse_args()
+
+    tilemap = convert(args.source, args.destination)
+    print(f"{args.source} -> {args.destination}: {tilemap.tile_count} tiles, {len(tilemap.offgrid_tiles)} offgrid tiles")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,27 @@
 import pygame as pg
+import argparse
+import os
 import sys
 
 # Import necessary components from other scripts
 from scripts.enteties import PhysicsEntity, Player
-from scripts.utils import load_image, load_images, Animation
+from scripts.utils import load_image, load_images, Animation, assets
 from scripts.tilemap import Tilemap
+from scripts.history import Edit, History, Journal, recover
+from scripts.brushes import BRUSHES, line_cells, rect_cells, cell_bounds
+from scripts.dirty import DirtyRegions
+from scripts.presenter import Presenter, WINDOW_SIZE, add_window_arguments
 
-RENDER_SCALE = 2.0 
+# Assets that can be placed in a level, in the order the scroll wheel cycles through them
+EDITOR_TILES = ["brick", "ground", "bush1", "bush2", "bush3", "bushes", "random", "castle",
+                "koopa", "goomba", "flag", "flower1", "flower2", "flower3", "flower4"]
+# Map edited when no other is asked for
+EDITOR_MAP = "map2.json"
+# Outline colors of the area a line or rect brush is dragged over, and of the selection
+SHAPE_COLOR = (255, 255, 255)
+SELECTION_COLOR = (255, 255, 0)
+# Milliseconds between saves of the whole map while there are edits only in the journal
+AUTOSAVE_INTERVAL = 30000
 
 
 class Editor:
@@ -15,16 +30,40 @@ class Editor:
 
     This editor allows for placing, moving, and removing various game assets on a grid to design custom levels. It includes basic functionality for level manipulation and saving.
 
+    Every stroke of the mouse is one edit that can be undone with Ctrl+Z and redone with Ctrl+Y or
+    Ctrl+Shift+Z. Edits are written to the map's journal on a background thread as they are made,
+    and the whole map is saved every AUTOSAVE_INTERVAL, when S is pressed and when the editor closes.
+    Edits left in the journal by a crash are replayed when the map is opened again.
+
+    The number keys pick a brush from BRUSHES. The pencil paints or erases one cell per frame under
+    the mouse. The line and rect brushes are dragged from one cell to another and fill the cells in
+    between when the button is let go, the left button with the selected tile and the right one
+    with nothing. The fill brush fills the area of same tiles under the mouse. The select brush
+    drags out a region that Ctrl+C copies, Ctrl+X cuts and Ctrl+V pastes at the mouse. Every one of
+    them changes the tilemap in one batch and is one step to undo.
+
     Attributes:
         running (bool): Whether the editor is running.
         display (pygame.Surface): The main surface where the level is drawn.
+        presenter (Presenter): Scales the display onto the window.
         screen (pygame.Surface): The window on which the display surface is scaled and drawn.
         clock (pygame.Clock): A clock to control the frame rate of the editor.
+        path (str): The map file being edited.
         tilemap (Tilemap): The tilemap being edited.
-        assets (dict): A dictionary of game assets available for use in the level.
+        journal (Journal): Writes the edits and saves the map in the background.
+        history (History): The edits that can be undone and redone.
+        stroke (Edit): The edit being made while a mouse button is held down, or None.
+        brush (str): The brush grid tiles are placed with, one of BRUSHES.
+        anchor (tuple): The grid position a line, rect or selection drag started at, or None.
+        selection (tuple): The inclusive tile bounds of the selected region, or None.
+        clipboard (tuple): The copied grid tiles by position relative to the region's top left
+            corner, and the copied offgrid tiles as (type, x, y) relative to it in pixels, or None.
+        shape (tuple): What the brush outline showed last frame, to redraw only when it changes.
+        saved_at (int): When the map was last saved, in pygame ticks.
+        assets (AssetRegistry): The shared registry of game assets.
         movement (list): A list indicating which directions the camera is moving.
         scroll (list): The current x and y offsets of the camera.
-        tile_list (list): A list of the keys in the assets dictionary for easy access.
+        tile_list (list): The names of the assets that can be placed in the level.
         tile_group (int): The index of the currently selected asset group.
         tile_variant (int): The index of the currently selected asset within the group (unused).
         clicking (bool): Whether the left mouse button is currently held down.
@@ -32,52 +71,63 @@ class Editor:
         shift (bool): Whether the shift key is currently held down (unused).
         ongrid (bool): Whether new assets should snap to the grid when placed.
         mpos (list): The current position of the mouse cursor.
+        dirty (DirtyRegions): The parts of the display changed since the last frame was shown.
+        previews (dict): The see-through cursor image of every asset, by asset name.
+        cursor (tuple): The area and asset of the cursor image drawn last frame.
     """
-    def __init__(self) -> None:
-        """Initializes the editor, setting up the Pygame window, loading assets, and preparing for user input."""
+    def __init__(self, path=EDITOR_MAP, window=WINDOW_SIZE, scale_mode="integer", fullscreen=False, vsync=False) -> None:
+        """
+        Initializes the editor, setting up the Pygame window, loading assets, and preparing for user input.
+
+        Args:
+            path (str, optional): The map file to edit, made on the first save if it does not exist.
+                Defaults to EDITOR_MAP.
+            window (tuple, optional): The window size. Defaults to WINDOW_SIZE.
+            scale_mode (str, optional): How the display is scaled to the window, see Presenter. Defaults to "integer".
+            fullscreen (bool, optional): Whether to fill the screen. Defaults to False.
+            vsync (bool, optional): Whether to wait for the monitor's refresh when showing a frame. Defaults to False.
+        """
         # Initialize the editor, setting up the window and loading assets
         pg.init()
         pg.display.set_caption("editor")
         self.running = True
         self.display = pg.Surface((320, 240))
 
-        self.screen = pg.display.set_mode((640, 480))
+        self.presenter = Presenter(self.display.get_size(), window, scale_mode, fullscreen, vsync)
+        self.screen = self.presenter.screen
         self.clock = pg.time.Clock()
 
         # Initialize the tilemap for the level being edited
         self.tilemap = Tilemap(self)
 
-        self.img = pg.image.load("images/mario/small/right/idle/idle.png")
+        self.img = load_image("mario/small/right/idle/idle.png")
         self.img_pos = [160, 260]
         self.movement = [False, False]
         self.jump_count = 0
 
-        # Load game assets that can be placed in the level
-        self.assets = {
-            "brick": load_image("brick.png"),
-            "ground": load_image("ground.png"),
-            "bush1": load_image("another/bush.png"),
-            "bush2": load_image("another/bush2.png"),
-            "bush3": load_image("another/bush3.png"),
-            "bushes": load_image("another/bushes.png"),
-            "random": load_image("another/random/random.png"),
-            "castle": load_image("castle/castle.png"),
-            "koopa": load_image("koopa/right/run/koopa.png"),
-            "goomba": load_image("goomba/run/goombs1.png"),
-            "flag": load_image("flag1.png"),
-            "flower1": load_image("flower/flower1.png"),
-            "flower2": load_image("flower/flower2.png"),
-            "flower3": load_image("flower/flower3.png"),
-            "flower4": load_image("flower/flower4.png"),
-
-
-        }
+        # Game assets come from the registry shared with the game
+        self.assets = assets
 
         # Movement and camera control variables
         self.movement = [False, False, False, False]
         self.scroll = [0, 0]
         self.tilemap = Tilemap(self)
-        self.tile_list = list(self.assets)
+        self.path = path
+        if os.path.exists(path):
+            self.tilemap.load(path)
+        recovered = recover(self.tilemap, path)
+        if recovered:
+            print(f"recovered {recovered} unsaved edits from {path}")
+        self.journal = Journal(path, pending=recovered)
+        self.history = History(self.journal)
+        self.stroke = None
+        self.saved_at = pg.time.get_ticks()
+        self.brush = BRUSHES[0]
+        self.anchor = None
+        self.selection = None
+        self.clipboard = None
+        self.shape = None
+        self.tile_list = EDITOR_TILES
         self.tile_group = 0
         self.tile_variant = 0
         self.clicking = False
@@ -86,21 +136,32 @@ class Editor:
         self.ongrid = True
         self.mpos = [0, 0]
 
+        # The window is only redrawn where something changed, see run()
+        self.dirty = DirtyRegions()
+        self.previews = {}
+        self.cursor = None
+
     def handle_events(self):
         """Handles user input from the mouse and keyboard to manipulate the level and navigate the editor."""
         # Process input events to control the editor and modify the level
         for event in pg.event.get():
             if event.type == pg.QUIT:
+                self.close()
                 pg.quit()
                 sys.exit()
 
             # Mouse and keyboard event handling for editing commands
             if event.type == pg.MOUSEBUTTONDOWN:
+                if event.button in (1, 3) and self.stroke is None:
+                    self.stroke = Edit()
+                if event.button in (1, 3) and self.ongrid and self.brush != "pencil":
+                    self.brush_down(event.button)
                 if event.button == 1:
                     self.clicking = True
                     if not self.ongrid:
-                        self.tilemap.offgrid_tiles.append({"type": self.tile_list[self.tile_group], "pos": (
-                            self.mpos[0] + self.scroll[0], self.mpos[1] + self.scroll[1])})
+                        self.stroke.add_offgrid(self.tilemap.add_offgrid(
+                            self.tile_list[self.tile_group], (self.mpos[0] + self.scroll[0], self.mpos[1] + self.scroll[1])))
+                        self.dirty.add(self.assets[self.tile_list[self.tile_group]].get_rect(topleft=self.mpos).inflate(2, 2))
 
                 if event.button == 3:
                     self.right_clicking = True
@@ -116,10 +177,35 @@ class Editor:
                     self.clicking = False
                 if event.button == 3:
                     self.right_clicking = False
+                if event.button in (1, 3) and self.anchor is not None:
+                    self.brush_up(event.button)
+                if not self.clicking and not self.right_clicking:
+                    self.end_stroke()
 
             if event.type == pg.KEYDOWN:
-                if event.key == pg.K_s:
-                    self.tilemap.save("map2.json")
+                if event.key == pg.K_z and event.mod & pg.KMOD_CTRL:
+                    self.end_stroke()
+                    if event.mod & pg.KMOD_SHIFT:
+                        self.redo()
+                    else:
+                        self.undo()
+                elif event.key == pg.K_y and event.mod & pg.KMOD_CTRL:
+                    self.end_stroke()
+                    self.redo()
+                elif event.key == pg.K_c and event.mod & pg.KMOD_CTRL:
+                    self.copy()
+                elif event.key == pg.K_x and event.mod & pg.KMOD_CTRL:
+                    self.end_stroke()
+                    self.copy(cut=True)
+                elif event.key == pg.K_v and event.mod & pg.KMOD_CTRL:
+                    self.end_stroke()
+                    self.paste()
+                elif event.key == pg.K_s:
+                    self.end_stroke()
+                    self.save()
+                elif pg.K_1 <= event.key < pg.K_1 + len(BRUSHES):
+                    self.brush = BRUSHES[event.key - pg.K_1]
+                    self.anchor = None
                 if event.key == pg.K_LEFT:
                     self.movement[0] = True
                 if event.key == pg.K_RIGHT:
@@ -143,6 +229,116 @@ class Editor:
                 if event.key == pg.K_DOWN:
                     self.movement[3] = False
 
+    def hovered_tile(self):
+        """Returns the grid position under the mouse."""
+        size = self.tilemap.tile_size
+        return (int((self.mpos[0] + self.scroll[0]) // size), int((self.mpos[1] + self.scroll[1]) // size))
+
+    def brush_down(self, button):
+        """Starts a drag with the line, rect or select brush, or fills the area under the mouse with the fill brush."""
+        tile_pos = self.hovered_tile()
+        if self.brush == "fill":
+            tile_type = self.tile_list[self.tile_group] if button == 1 else None
+            self.change_tiles({pos: tile_type for pos in self.tilemap.flood(tile_pos)})
+        elif self.brush == "select" and button == 3:
+            self.selection = None
+        else:
+            self.anchor = tile_pos
+
+    def brush_up(self, button):
+        """Fills the line or rect dragged out, or selects the region dragged over."""
+        anchor, self.anchor = self.anchor, None
+        tile_pos = self.hovered_tile()
+        if self.brush == "select":
+            self.selection = cell_bounds(anchor, tile_pos)
+            return
+        cells = line_cells(anchor, tile_pos) if self.brush == "line" else rect_cells(anchor, tile_pos)
+        tile_type = self.tile_list[self.tile_group] if button == 1 else None
+        self.change_tiles({pos: tile_type for pos in cells})
+
+    def change_tiles(self, tiles):
+        """
+        Changes many grid tiles as one batch, recorded in the current stroke.
+
+        Args:
+            tiles (dict): The new tile type, or None for an empty cell, by (x, y) grid position.
+        """
+        changed = self.tilemap.set_tiles(tiles)
+        if changed:
+            if self.stroke is None:
+                self.stroke = Edit()
+            self.stroke.set_tiles(changed)
+            self.dirty.full()
+
+    def copy(self, cut=False):
+        """
+        Copies the grid and offgrid tiles in the selected region to the clipboard.
+
+        Args:
+            cut (bool, optional): Whether to also remove them from the map, as one edit. Defaults to False.
+        """
+        if self.selection is None:
+            return
+        left, top, right, bottom = self.selection
+        size = self.tilemap.tile_size
+        area = pg.Rect(left * size, top * size, (right - left + 1) * size, (bottom - top + 1) * size)
+        tiles = self.tilemap.region(left, top, right, bottom)
+        # Offgrid tiles belong to the region their top left corner is in
+        offgrid = [tile for tile in self.tilemap.offgrid_in(area, include_markers=True) if area.collidepoint(tile["pos"])]
+        self.clipboard = (tiles, [(tile["type"], tile["pos"][0] - area.x, tile["pos"][1] - area.y) for tile in offgrid])
+        if cut:
+            self.change_tiles({(left + dx, top + dy): None for dx, dy in tiles})
+            if offgrid:
+                self.stroke = self.stroke or Edit()
+                for tile in offgrid:
+                    self.tilemap.remove_offgrid(tile)
+                    self.stroke.remove_offgrid(tile)
+                self.dirty.full()
+            self.end_stroke()
+
+    def paste(self):
+        """Pastes the clipboard with its top left corner at the grid position under the mouse, as one edit."""
+        if self.clipboard is None:
+            return
+        tiles, offgrid = self.clipboard
+        x, y = self.hovered_tile()
+        self.change_tiles({(x + dx, y + dy): tile_type for (dx, dy), tile_type in tiles.items()})
+        if offgrid:
+            self.stroke = self.stroke or Edit()
+            size = self.tilemap.tile_size
+            for tile_type, dx, dy in offgrid:
+                self.stroke.add_offgrid(self.tilemap.add_offgrid(tile_type, [x * size + dx, y * size + dy]))
+            self.dirty.full()
+        self.end_stroke()
+
+    def end_stroke(self):
+        """Ends the edit made while a mouse button was held down, making it one step to undo. A button still held starts the next one."""
+        if self.stroke is not None:
+            self.history.push(self.stroke)
+            self.stroke = Edit() if self.clicking or self.right_clicking else None
+
+    def undo(self):
+        """Undoes the last edit."""
+        if self.history.undo(self.tilemap):
+            self.dirty.full()
+
+    def redo(self):
+        """Makes the last undone edit again."""
+        if self.history.redo(self.tilemap):
+            self.dirty.full()
+
+    def save(self):
+        """Saves the whole map in the background and empties the journal."""
+        self.journal.compact(self.tilemap.snapshot())
+        self.saved_at = pg.time.get_ticks()
+
+    def close(self):
+        """Saves any edits not saved yet and waits for them to be written."""
+        self.end_stroke()
+        if self.journal.pending:
+            self.save()
+        self.journal.close()
+
     def adjust_cam(self):
         """
         Adjusts the camera's position based on user input. This allows the user to move the view around the level.
@@ -157,65 +353,142 @@ class Editor:
                            self.display.get_height() / 2 - self.scroll[1]) / 30
         return (int(self.scroll[0]), int(self.scroll[1]))
 
+    def preview(self, tile_type):
+        """
+        Returns the see-through image drawn under the cursor for an asset, made once per asset.
+
+        Args:
+            tile_type (str): The name of the asset.
+
+        Returns:
+            pygame.Surface: The image with its alpha lowered.
+        """
+        img = self.previews.get(tile_type)
+        if img is None:
+            img = self.previews[tile_type] = self.assets[tile_type].copy()
+            img.set_alpha(100)
+        return img
+
+    def tile_rect(self, tile_pos, tile_type):
+        """Returns the display area covered by an asset placed on a grid position."""
+        size = self.tilemap.tile_size
+        return self.assets[tile_type].get_rect(topleft=(tile_pos[0] * size - self.scroll[0],
+                                                        tile_pos[1] * size - self.scroll[1]))
+
+    def render_shapes(self, tile_pos, offset):
+        """
+        Draws the line or rect being dragged out and the selected region.
+
+        Args:
+            tile_pos (tuple): The grid position under the mouse.
+            offset (tuple): The camera scroll.
+        """
+        size = self.tilemap.tile_size
+        if self.anchor is not None and self.brush == "line":
+            img = self.preview(self.tile_list[self.tile_group])
+            for x, y in line_cells(self.anchor, tile_pos):
+                self.display.blit(img, (x * size - offset[0], y * size - offset[1]))
+        outlines = [(self.selection, SELECTION_COLOR)]
+        if self.anchor is not None and self.brush != "line":
+            outlines.append((cell_bounds(self.anchor, tile_pos), SELECTION_COLOR if self.brush == "select" else SHAPE_COLOR))
+        for bounds, color in outlines:
+            if bounds is not None:
+                left, top, right, bottom = bounds
+                pg.draw.rect(self.display, color, (left * size - offset[0], top * size - offset[1],
+                                                   (right - left + 1) * size, (bottom - top + 1) * size), 1)
+
     def run(self):
         """
         The main loop of the editor. Handles events, updates the state, and renders the editor and level to the screen.
+
+        The level is only redrawn when something changed, and only the changed parts are copied to
+        the window unless the camera moved, so an idle editor does next to no work.
         """
         # Main loop for running the editor
         while self.running:
-            self.display.fill((0, 0, 0))  # Clear the display each frame
+            self.handle_events()
 
             # Update camera scroll based on keyboard movement
+            old_scroll = tuple(self.scroll)
             self.scroll[0] += (self.movement[1] - self.movement[0]) * 2
             self.scroll[1] += (self.movement[3] - self.movement[2]) * 2
+            if tuple(self.scroll) != old_scroll:
+                self.dirty.full()
 
-            # Render the current state of the tilemap
-            render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
-            self.tilemap.render(self.display, offset=render_scroll)
+            # Adjust mouse position based on render scale
+            self.mpos = self.presenter.to_display(pg.mouse.get_pos())
+            tile_pos = self.hovered_tile()
+            tile_type = self.tile_list[self.tile_group]
 
-            # Display the currently selected tile at the mouse position
-            current_tile_img = self.assets[self.tile_list[self.tile_group]].copy(
-            )
-            current_tile_img.set_alpha(100)
+            # Handle placing and removing tiles with mouse clicks, the other brushes act on press and release
+            pencil = self.brush == "pencil" or not self.ongrid
+            if (self.clicking or self.right_clicking) and self.stroke is None:
+                self.stroke = Edit()
+            if self.clicking and self.ongrid and pencil:
+                old = self.tilemap.get_tile(tile_pos)
+                if old != tile_type:
+                    self.tilemap.set_tile(tile_pos, tile_type)
+                    self.stroke.set_tile(tile_pos, old, tile_type)
+                    self.dirty.add(self.tile_rect(tile_pos, tile_type))
+                    if old is not None:
+                        self.dirty.add(self.tile_rect(tile_pos, old))
+            if self.right_clicking and pencil:
+                old = self.tilemap.get_tile(tile_pos)
+                if old is not None:
+                    self.tilemap.remove_tile(tile_pos)
+                    self.stroke.set_tile(tile_pos, old, None)
+                    self.dirty.add(self.tile_rect(tile_pos, old))
+                # Only the offgrid tiles in the buckets under the cursor are checked
+                for tile in self.tilemap.offgrid_at((self.mpos[0] + self.scroll[0], self.mpos[1] + self.scroll[1]),
+                                                     include_markers=True):
+                    self.tilemap.remove_offgrid(tile)
+                    self.stroke.remove_offgrid(tile)
+                    tile_r = self.assets[tile["type"]].get_rect(topleft=(tile["pos"][0] - self.scroll[0],
+                                                                         tile["pos"][1] - self.scroll[1]))
+                    self.dirty.add(tile_r.inflate(2, 2))
 
-            # Adjust mouse position based on render scale and display the tile accordingly
-            self.mpos = pg.mouse.get_pos()
-            self.mpos = (self.mpos[0] / RENDER_SCALE,
-                         self.mpos[1] / RENDER_SCALE)
-            tile_pos = (int((self.mpos[0] + self.scroll[0]) // self.tilemap.tile_size), int(
-                self.mpos[1] + self.scroll[1]) // self.tilemap.tile_size)
-
-            # Handle placing and removing tiles with mouse clicks
+            # The selected tile is shown at the mouse position and in the corner
+            current_tile_img = self.preview(tile_type)
             if self.ongrid:
-                self.display.blit(current_tile_img, (tile_pos[0] * self.tilemap.tile_size -
-                                  self.scroll[0], tile_pos[1] * self.tilemap.tile_size - self.scroll[1]))
-            elif not self.ongrid:
-                self.display.blit(current_tile_img, self.mpos)
-
-            if self.clicking and self.ongrid:
-                self.tilemap.tilemap[str(tile_pos[0]) + ";" + str(tile_pos[1])] = {
-                    "type": self.tile_list[self.tile_group], "pos": tile_pos}
-            if self.right_clicking:
-                tile_loc = str(tile_pos[0]) + ";" + str(tile_pos[1])
-                if tile_loc in self.tilemap.tilemap:
-                    del self.tilemap.tilemap[tile_loc]
-                for tile in self.tilemap.offgrid_tiles.copy():
-                    tile_img = self.assets[tile["type"]]
-                    tile_r = pg.Rect(tile["pos"][0] - self.scroll[0], tile["pos"][1] -
-                                     self.scroll[1], tile_img.get_width(), tile_img.get_height())
-                    if tile_r.collidepoint(self.mpos):
-                        self.tilemap.offgrid_tiles.remove(tile)
-
-            # Update the display and cap the frame rate
-            self.display.blit(current_tile_img, (5, 5))
-            self.handle_events()
-            self.screen.blit(pg.transform.scale(
-                self.display, self.screen.get_size()), (0, 0))
+                cursor_pos = (tile_pos[0] * self.tilemap.tile_size - self.scroll[0],
+                              tile_pos[1] * self.tilemap.tile_size - self.scroll[1])
+            else:
+                cursor_pos = self.mpos
+            # Off the grid the cursor sits at fractional positions, which blits may round either way
+            cursor = (current_tile_img.get_rect(topleft=cursor_pos).inflate(2, 2), tile_type)
+            if cursor != self.cursor:
+                self.dirty.add(cursor[0])
+                self.dirty.add(current_tile_img.get_rect(topleft=(5, 5)))
+                if self.cursor is not None:
+                    self.dirty.add(self.cursor[0])
+                    self.dirty.add(self.preview(self.cursor[1]).get_rect(topleft=(5, 5)))
+                self.cursor = cursor
+            # The brush and selection outlines can cover the whole display, so they redraw it when they change
+            shape = (self.brush, self.anchor, tile_pos if self.anchor is not None else None, self.selection)
+            if shape != self.shape:
+                self.dirty.full()
+                self.shape = shape
 
-            pg.display.update()
+            # Redraw only if something changed, and cap the frame rate
+            if self.dirty:
+                self.display.fill((0, 0, 0))
+                render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
+                self.tilemap.render(self.display, offset=render_scroll)
+                self.render_shapes(tile_pos, render_scroll)
+                self.display.blit(current_tile_img, cursor_pos)
+                self.display.blit(current_tile_img, (5, 5))
+                self.presenter.show(self.dirty.draw(self.display, self.presenter))
+            # Edits are in the journal already, the map itself is saved now and then
+            if self.journal.pending and pg.time.get_ticks() - self.saved_at > AUTOSAVE_INTERVAL:
+                self.save()
             self.clock.tick(60)
 
 
 # Create and run the editor instance
 if __name__ == "__main__":
-    Editor().run()
+    parser = argparse.ArgumentParser(description="Mario level editor")
+    parser.add_argument("map", nargs="?", default=EDITOR_MAP,
+                        help="map file to edit, .json or .bmap, made if it does not exist (default: %(default)s)")
+    add_window_arguments(parser)
+    args = parser.parse_args()
+    Editor(args.map, args.window, args.scale_mode, args.fullscreen, args.vsync).run()
@@ -1,143 +1,286 @@
 import pygame as pg 
+import argparse
+import bisect
+import os
 import sys
 import time
 
 
 # Import necessary components from other scripts
-from scripts.enteties import PhysicsEntity, Player, Randoms, Goomba, Koopa
-from scripts.utils import load_image, load_images, Animation
-
-from scripts.tilemap import Tilemap
-from scripts.clouds import Clouds
+from scripts.enteties import PhysicsEntity, Player, Randoms, Goomba, Koopa, MOB_REACH
+from scripts.utils import load_image, decode_image, AnimationClock, assets
+
+from scripts.tilemap import Tilemap, BINARY_MAP_EXTENSION
+from scripts.clouds import cloud_layers
+from scripts.parallax import Parallax
+from scripts.sounds import SoundBank
+from scripts.spatial import SpatialHash
+from scripts.registry import EntityRegistry
+from scripts.streaming import LevelStream
+from scripts.profiler import FrameProfiler
+from scripts.dirty import DirtyRegions
+from scripts.presenter import Presenter, WINDOW_SIZE, add_window_arguments
+from scripts.loading import Loader, render_loading
+from scripts.batch import MobBatch, BATCH_TYPES, BATCH_MIN_MOBS
+
+# How far outside the view, in pixels, mobs are spawned and kept awake
+ACTIVATION_MARGIN = 64
+# Anything falling below this y position has left the level
+WORLD_BOTTOM = 30*16
+# Simulation ticks per second, independent of the frame rate
+TICK_RATE = 60
+# The most ticks simulated before drawing a frame, so a slow frame can not snowball
+MAX_CATCHUP_TICKS = 5
+# Default cap on frames drawn per second, 0 for no cap
+MAX_FPS = 240
+# The class and size of the mob spawned by each spawn point tile
+MOB_SPAWNS = {"goomba": (Goomba, (14,14)), "koopa": (Koopa, (14,20))}
 
 
 class Game:
     """
     Main class for the game, handling initialization, game loop, and events.
+
+    In headless mode the game uses SDL's dummy video and audio drivers, plays no music, never
+    waits on the frame clock or the end screens, and is driven one tick at a time with `step()`.
     
     Attributes:
         running (bool): Indicates if the game is currently running.
+        headless (bool): Whether the game runs without a window, audio or frame rate cap.
+        batch (MobBatch): Moves large crowds of mobs with NumPy, or None to update every mob on its own.
         display (pygame.Surface): The primary surface for rendering game objects.
+        presenter (Presenter): Scales the display onto the window.
         screen (pygame.Surface): The window surface.
         clock (pygame.Clock): Clock used to control game frame rate.
         img (pygame.Surface): The player's image.
         img_pos (list): Position of the player's image.
         movement (list): A boolean list indicating movement directions.
-        harmfull_mobs (list): List of all harmful mobs in the game.
-        harmless_mobs (list): List of all harmless mobs in the game.
-        assets (dict): Dictionary containing all loaded game assets.
-        clouds (Clouds): The cloud generator for the game's background.
+        entities (EntityRegistry): The registry every mob and item is spawned into.
+        harmfull_mobs (dict_values): All harmful mobs in the game, updated once per tick by the registry.
+        harmless_mobs (dict_values): All harmless mobs in the game, updated once per tick by the registry.
+        anim_clock (AnimationClock): Animation clock shared by all mobs.
+        mob_hash (SpatialHash): The harmful mobs bucketed by position.
+        near_player (set): The harmful mobs close enough to touch the player this tick.
+        sounds (SoundBank): The preloaded sound effects.
+        assets (AssetRegistry): The shared registry of game assets.
+        backdrop (Parallax): The background and the cloud layers drawn behind the level.
         player (Player): The player entity.
         scroll (list): The current scrolling offset of the game camera.
+        prev_scroll (list): The camera scroll before the last tick, for render interpolation.
+        max_fps (int): The most frames drawn per second, 0 for no cap.
+        profiler (FrameProfiler): Times the phases of every frame while enabled.
+        trace (str): The file the frame trace is written to when the game ends, or None.
+        dirty (DirtyRegions): The parts of the display changed since the last frame was shown.
+        started (float): The time.perf_counter() the game started loading at, moved forward by any
+            time spent waiting for the player to pick a level.
+        startup_time (float): The seconds from `started` until the game was ready to run.
+        time_to_first_frame (float): The seconds from `started` until `run()` showed its first frame,
+            or None before that.
         tilemap (Tilemap): The game's tilemap.
         castleX (int): The x position of the castle in the game.
+        activation_margin (int): How far outside the view mobs are spawned and kept awake.
+        spawn_points (list): The (x, y, type) of every mob not spawned yet, sorted by x.
+        active_mobs (list): The harmful mobs awake this tick.
+        interactive (dict): The interactive tiles of this game, like the Randoms, by (x, y) grid position.
     """
 
-    def __init__(self) -> None:
-        """Initializes the game, setting up the window, loading assets, and preparing the game environment."""
+    def __init__(self, level=None, headless=False, batch_physics=False, stream=False, fps=MAX_FPS, trace=None,
+                 window=WINDOW_SIZE, scale_mode="integer", fullscreen=False, vsync=False) -> None:
+        """
+        Initializes the game, setting up the window, loading assets, and preparing the game environment.
+
+        Images and sounds are decoded and the map is loaded on a Loader's threads, while a loading
+        screen shows the progress.
+
+        Args:
+            level (int or str, optional): The level number from 1 to 3, or the path of a map file.
+                The player is asked for a level number in the terminal if it is not given.
+            headless (bool, optional): Whether to run without a window, audio or frame rate cap. Defaults to False.
+            batch_physics (bool, optional): Whether to move crowds of goombas and koopas with NumPy. Defaults to False.
+            stream (bool, optional): Whether to stream the level from disk around the camera instead of
+                loading all of it. Needs a binary map. Defaults to False.
+            fps (int, optional): The most frames `run()` draws per second, 0 for no cap. Defaults to MAX_FPS.
+            trace (str, optional): A .csv or .json file to write the time of every frame phase to when
+                the game ends. Defaults to None, no trace.
+            window (tuple, optional): The window size. Defaults to WINDOW_SIZE.
+            scale_mode (str, optional): How the display is scaled to the window, see Presenter. Defaults to "integer".
+            fullscreen (bool, optional): Whether to fill the screen. Defaults to False.
+            vsync (bool, optional): Whether to wait for the monitor's refresh when showing a frame. Defaults to False.
+        """
 
-        # Initialize game, set up window, and load initial game assets
+        # Initialize game and set up window
+        self.started = time.perf_counter()
+        self.time_to_first_frame = None
+        self.headless = headless
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
         pg.init()
         pg.display.set_caption("Mario")
         pg.font.init()
         self.my_font = pg.font.SysFont('Comic Sans MS', 30)
-        pg.mixer.init()
+        if not headless:
+            pg.mixer.init()
 
         
         self.running = True 
         self.display = pg.Surface((320,240))
 
-        self.screen = pg.display.set_mode((640,480))
+        self.presenter = Presenter(self.display.get_size(), window, scale_mode, fullscreen, vsync)
+        self.screen = self.presenter.screen
         self.clock = pg.time.Clock()
+        self.max_fps = fps
+        self.trace = trace
+        self.profiler = FrameProfiler(tracing=trace is not None)  # F3 shows the frame time overlay
+        self.dirty = DirtyRegions()
+        self.drawn = None  # The render scroll, tilemap version and overlay state of the last frame drawn by run()
+
+        # Images and sound effects are decoded on other threads while the rest starts up
+        loader = Loader()
+        for path in assets.pending_files():
+            loader.submit(decode_image, path)
+        sounds = loader.submit(SoundBank)
 
-        self.img = pg.image.load("images/mario/small/right/idle/idle.png")
         self.img_pos = [160,260]
         self.movement = [False,False]
 
-        pg.font.init()
-        my_font = pg.font.SysFont('Comic Sans MS', 90)
-
-
-        # Initialize lists to manage different types of game entities
-        self.harmfull_mobs = []        
-        self.harmless_mobs = []        
-
-        # Load game assets and animations
-        self.assets = {
-            "brick": load_image("brick.png"),
-            "ground": load_image("ground.png"),
-            "bush1": load_image("another/bush.png"),
-            "bush2": load_image("another/bush2.png"),
-            "bush3": load_image("another/bush3.png"),
-            "bushes": load_image("another/bushes.png"),
-            "clouds": load_image("another/clouds.png"),
-            "flower1":load_image("flower/flower1.png"),
-            "flower2":load_image("flower/flower2.png"),
-            "flower3":load_image("flower/flower3.png"),
-            "flower4":load_image("flower/flower4.png"),
-            "background": load_image("another/color.png"),
-            "clouds": load_images("another/clouds"),
-            "coin":Animation(load_images("coins")),
-            "random":load_image("another/random/random.png"),
-            "sizeup/small/idle":Animation(load_images("sizeup/small")),
-            "random2":load_image("another/random/random3.png"),
-
-            "player/small/idle": Animation(load_images("mario/small/right/idle/"), img_dur=4),
-            "player/small/run": Animation(load_images("mario/small/right/run"), img_dur=4),
-            "player/small/jump": Animation(load_images("mario/small/jump"), img_dur=4),
-            "player/big/idle": Animation(load_images("mario/big/right/idle/"), img_dur=4),
-            "player/big/run": Animation(load_images("mario/big/right/run"), img_dur=4),
-            "player/big/jump": Animation(load_images("mario/big/jump"), img_dur=4),
-
-            "goomba/run": Animation(load_images("goomba/move", (0,255,0)), img_dur=10),
-
-            "koopa/run": Animation(load_images("koopa/right/run",), img_dur=6),
-            "shell/shell": Animation(load_images("koopa/dead"), img_dur=10),
-
-            "castle": load_image("castle/castle-1.png", (0,255,0)),
-            "koopa":load_image("koopa/right/run/koopa.png"),
-            "flag":load_image("flag1.png")
-        }
 
+        # Initialize the registry and groups that manage the different types of game entities
+        self.anim_clock = AnimationClock()  # Shared by every mob so they animate in lockstep
+        self.mob_hash = SpatialHash()  # Broadphase for collisions with harmful mobs
+        self.entities = EntityRegistry()
+        self.harmfull_mobs = self.entities.add_group("harmfull", spatial=self.mob_hash)
+        self.harmless_mobs = self.entities.add_group("harmless")
+        self.near_player = set()
+        self.interactive = {}  # The Randoms of this game by grid position
 
-        # Prepare game environment components like clouds and the player
-        self.clouds = Clouds(self.assets["clouds"], count=6)
-        self.player = Player(self, (50,50), (load_image("mario/small/right/idle/idle.png").get_width()*.8,load_image("mario/small/right/idle/idle.png").get_height()*.9))
+        # Game assets and animations are loaded from the shared registry
+        self.assets = assets
 
 
         self.scroll = [0,0]
+        self.prev_scroll = [0,0]
         self.tilemap = Tilemap(self)
         self.castleX = 0
+        self.activation_margin = ACTIVATION_MARGIN
+        self.spawn_points = []
+        self.spawn_xs = []
+        self.active_mobs = []
 
 
         # Level selection with validation
-        try:
-            map_input = int(input("velg et map fra en til tre. skriv '1' for map 1. "))
-        except ValueError:
-            raise Exception("Følg instrugs for valg av map.")
-            
-        
-        if not (map_input == 1 or map_input == 2 or map_input == 3):
-            raise Exception("Følg instrugs for valg av map.")
+        if level is None:
+            asked = time.perf_counter()
+            level = input("velg et map fra en til tre. skriv '1' for map 1. ")
+            self.started += time.perf_counter() - asked  # Time spent waiting for the player is not startup time
+
+        music = None
+        if stream:
+            if not (isinstance(level, str) and level.endswith(BINARY_MAP_EXTENSION)):
+                raise ValueError(f"streaming needs a {BINARY_MAP_EXTENSION} map, see convert_map.py")
+            path = level
+        elif isinstance(level, str) and level.endswith((".json", BINARY_MAP_EXTENSION)):
+            # Load a map file directly, used for custom and generated maps
+            path = level
         else:
-            # Load selected level and play background music
-            self.lvl1 = self.tilemap.load(f"maps/map{map_input}.json")
-            pg.mixer.music.load(f'sounds/level{map_input}.mp3')
+            try:
+                map_input = int(level)
+            except ValueError:
+                raise Exception("Følg instrugs for valg av map.")
+
+            if not (map_input == 1 or map_input == 2 or map_input == 3):
+                raise Exception("Følg instrugs for valg av map.")
+            else:
+                path = f"maps/map{map_input}.json"
+                music = f'sounds/level{map_input}.mp3'
+
+        # The map is parsed on another thread too, with a loading screen shown until everything is in
+        loader.submit(self.load_level, path, stream)
+        if not headless:
+            self.show_loading(loader)
+        loader.wait()
+
+        # Converting images needs the display, so it is done here with the decoded images
+        self.assets.preload()
+        self.sounds = sounds.result()
+        self.img = load_image("mario/small/right/idle/idle.png")
+
+        # Prepare game environment components like clouds and the player
+        self.backdrop = Parallax(self.assets["background"], cloud_layers(self.assets["clouds"], self.display.get_size(), count=6))
+        self.player = Player(self, (50,50), (self.img.get_width()*.8,self.img.get_height()*.9))
+        if stream:
+            self.update_stream()
+
+        self.batch = MobBatch(self.tilemap) if batch_physics else None
+
+        # Play background music for the selected level
+        if music is not None and not headless:
+            pg.mixer.music.load(music)
             pg.mixer.music.play()
+        self.startup_time = time.perf_counter() - self.started
+        self.profiler.startup["ready"] = self.startup_time
+
+    def tile_changed(self, pos, old, new):
+        """
+        Keeps the interactive tiles in step with the tilemap, subscribed to its tile changes.
+
+        Args:
+            pos (tuple): The (x, y) grid position of the tile that changed.
+            old (str): The old tile type, or None.
+            new (str): The new tile type, or None.
+        """
+        if new == "random" and pos not in self.interactive:
+            Randoms(self, pos)
+        elif new not in ("random", "random2"):
+            self.interactive.pop(pos, None)  # A used box stays registered as random2
+
+    def load_level(self, path, stream=False):
+        """
+        Loads a map and prepares its Randoms, mob spawn points and castle.
+
+        Touches neither the display nor the assets, so it can run on a loader thread.
+
+        Args:
+            path (str): The path of the map file.
+            stream (bool, optional): Whether to stream the map from disk instead of loading all of it.
+                Needs a binary map. Defaults to False.
+        """
+        if stream:
+            self.tilemap.stream(LevelStream(path))
+        else:
+            self.tilemap.load(path)
 
         # Initialize game entities based on the tilemap
         for random in self.tilemap.randoms:
-            Randoms(self, str(random[0])+";"+str(random[1]))
+            Randoms(self, random)
+        self.tilemap.subscribe(self.tile_changed)
 
-        for key in self.tilemap.tilemap:
-            if self.tilemap.tilemap[key]["type"] == "goomba":
-                Goomba(self, (self.tilemap.tilemap[key]["pos"][0]*self.tilemap.tile_size,self.tilemap.tilemap[key]["pos"][1]*self.tilemap.tile_size), (14,14))
-            
-            elif self.tilemap.tilemap[key]["type"] == "koopa":
-                Koopa(self, (self.tilemap.tilemap[key]["pos"][0]*self.tilemap.tile_size,self.tilemap.tilemap[key]["pos"][1]*self.tilemap.tile_size), (14,20))
+        # Mobs are only spawned once the camera gets close to their spawn point, see activate_mobs()
+        for tile_type in MOB_SPAWNS:
+            for pos in self.tilemap.find_tiles(tile_type):
+                self.spawn_points.append((pos[0]*self.tilemap.tile_size, pos[1]*self.tilemap.tile_size, tile_type))
+
+        castles = self.tilemap.find_tiles("castle")
+        if castles:
+            self.castleX = castles[-1][0]*self.tilemap.tile_size
+        self.spawn_points.sort()
+        self.spawn_xs = [point[0] for point in self.spawn_points]
 
-            elif self.tilemap.tilemap[key]["type"] == "castle":
-                self.castleX = self.tilemap.tilemap[key]["pos"][0]*self.tilemap.tile_size
+    def show_loading(self, loader):
+        """
+        Shows the loading screen until every job of a loader is done.
+
+        Args:
+            loader (Loader): The loader doing the startup work.
+        """
+        while not loader.done:
+            for event in pg.event.get():
+                if event.type == pg.QUIT:
+                    pg.quit()
+                    sys.exit()
+            render_loading(self.display, loader.progress)
+            self.presenter.present(self.display)
+            self.clock.tick(TICK_RATE)
 
     def handle_events(self):
         """Handles input events, including keyboard and mouse inputs, to control the game state."""
@@ -154,10 +297,9 @@ class Game:
                     if event.key == pg.K_RIGHT:
                         self.movement[1] = True
                     if event.key == pg.K_UP or event.key == pg.K_SPACE:
-                        if self.player.jump_count <= 1:
-                            self.player.velocity[1] = -3
-                            self.player.jump_count += 1
-                            pg.mixer.Sound('sounds/jump.ogg').play()
+                        self.jump()
+                    if event.key == pg.K_F3:
+                        self.profiler.toggle_overlay()
 
                 if event.type == pg.KEYUP:
                     if event.key == pg.K_LEFT:
@@ -165,6 +307,13 @@ class Game:
                     if event.key == pg.K_RIGHT:
                         self.movement[1] = False
 
+    def jump(self):
+        """Makes the player jump, allowing one extra jump in the air."""
+        if self.player.jump_count <= 1:
+            self.player.velocity[1] = -3
+            self.player.jump_count += 1
+            self.sounds.play("jump")
+
     def adjust_cam(self):
         """
         Adjusts the camera scroll based on the player's position to ensure the player remains in view.
@@ -174,36 +323,152 @@ class Game:
         """
 
         # Adjust camera scroll based on player position to keep player in view
+        self.prev_scroll[0], self.prev_scroll[1] = self.scroll
         self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / 30
         self.scroll[1] += (self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]) / 30
         return (int(self.scroll[0]), int(self.scroll[1]))
     
+    def interpolated_scroll(self, alpha):
+        """
+        Returns the camera scroll part of the way from the previous tick to the current one.
+
+        Args:
+            alpha (float): How far to go, from 0 for the previous tick to 1 for the current one.
+
+        Returns:
+            tuple: The interpolated camera scroll position.
+        """
+        back = 1 - alpha
+        return (int(self.scroll[0] - (self.scroll[0] - self.prev_scroll[0]) * back),
+                int(self.scroll[1] - (self.scroll[1] - self.prev_scroll[1]) * back))
+
+    def spawn_mobs(self, left, right):
+        """
+        Spawns the mobs of every remaining spawn point between two x positions.
+
+        Args:
+            left (float): The leftmost x position to spawn mobs at.
+            right (float): The rightmost x position to spawn mobs at.
+        """
+        start = bisect.bisect_left(self.spawn_xs, left)
+        end = bisect.bisect_right(self.spawn_xs, right)
+        if start == end:
+            return
+        for x, y, mob_type in self.spawn_points[start:end]:
+            mob_class, size = MOB_SPAWNS[mob_type]
+            mob_class(self, (x, y), size)
+        del self.spawn_points[start:end]
+        del self.spawn_xs[start:end]
+        self.entities.flush()
+
+    def activate_mobs(self):
+        """
+        Spawns the mobs that came within the activation margin of the view and collects the awake ones.
+
+        Mobs outside the margin sleep: they stay where they are and are neither updated nor rendered,
+        so the cost of a tick depends on how many mobs are near the camera, not on the level length.
+        """
+        margin = self.activation_margin
+        left = self.scroll[0] - margin
+        right = self.scroll[0] + self.display.get_width() + margin
+        self.spawn_mobs(left, right)
+
+        window = pg.Rect(left, self.scroll[1] - margin, right - left, self.display.get_height() + 2*margin)
+        self.active_mobs = self.mob_hash.query(window)
+
+    def update_stream(self):
+        """Moves the streamed part of the level along with the camera, covering the player and every awake mob."""
+        left = min(self.scroll[0], self.player.pos[0]) - self.activation_margin
+        right = max(self.scroll[0] + self.display.get_width(), self.player.pos[0]) + self.activation_margin
+        self.tilemap.update_stream(left, right)
+
     def update(self):
         """Updates the game state, including cloud movements, mob updates, player updates, and checks for game end conditions."""
 
         # Update all mobs
-        self.clouds.update()
-        for mob in self.harmless_mobs: mob.update(self.tilemap)
-        for mob in self.harmfull_mobs: mob.update(self.tilemap)
+        self.backdrop.update()
+        self.anim_clock.update()
+        self.profiler.mark("clouds")
+        if self.tilemap.level is not None:
+            self.update_stream()
+        self.activate_mobs()
+
+        # Remember where everything starts the tick, for render interpolation
+        self.player.snapshot()
+        for mob in self.active_mobs:
+            mob.snapshot()
+        for mob in self.harmless_mobs:
+            mob.snapshot()
+
+        self.near_player = set(self.mob_hash.query(self.player.rect(), MOB_REACH))
+        for mob in self.harmless_mobs:
+            if mob.alive: mob.update(self.tilemap)
+
+        # Large crowds move in one batch, except mobs near the player which need the full collision handling
+        single = self.active_mobs
+        if self.batch is not None and len(single) >= BATCH_MIN_MOBS:
+            batched = [mob for mob in single if mob.type in BATCH_TYPES and mob not in self.near_player]
+            single = [mob for mob in single if mob.type not in BATCH_TYPES or mob in self.near_player]
+            self.batch.step(batched)
+        for mob in single:
+            if mob.alive:  # Skip mobs knocked out earlier in this tick
+                mob.update(self.tilemap)
+
+        for mob in self.active_mobs:
+            if not mob.alive:
+                continue
+            if mob.pos[1] > WORLD_BOTTOM:
+                self.entities.despawn(mob)  # Fell out of the level
+            elif mob.alive:
+                self.mob_hash.update(mob)
+        self.profiler.mark("mobs")
         self.player.update(self.tilemap, (self.movement[1]-self.movement[0],0))
+        self.entities.flush()  # Apply this tick's spawns and despawns, timed with the player
+        self.profiler.mark("player")
 
         # Check for win or loss
-        if self.player.pos[1] > 30*16:
+        if self.player.pos[1] > WORLD_BOTTOM:
             self.defeat()
         if self.player.pos[0] > self.castleX:
             self.victory()
 
+    def step(self, inputs=()):
+        """
+        Advances the simulation by exactly one tick without rendering or reading input events.
+
+        Args:
+            inputs (iterable, optional): The actions held during this tick, any of "left", "right" and "jump".
+
+        Returns:
+            bool: Whether the game is still running.
+        """
+        self.profiler.begin_frame()
+        self.movement[0] = "left" in inputs
+        self.movement[1] = "right" in inputs
+        if "jump" in inputs:
+            self.jump()
+        self.profiler.mark("events")
+
+        self.adjust_cam()
+        self.profiler.mark("camera")
+        self.update()
+        self.sounds.end_frame()
+        self.profiler.end_frame()
+        return self.running
+
     def victory(self):
         """Handles the victory condition, displaying the victory screen and ending the game."""
 
+        if self.headless:
+            self.running = False
+            return
+
         # Display victory screen and end game
         self.display.blit(self.assets["background"], (0,0))
         text_surface = self.my_font.render('Victory', False, (0, 255, 0))
         self.display.blit(text_surface, (0,0))
-        self.display.blit(load_image("sizeup/small/01sizeup.png"), (130,10))
-        self.screen.blit(pg.transform.scale(self.display,self.screen.get_size()),(0,0))
-
-        pg.display.update()
+        self.display.blit(self.assets["victory"], (130,10))
+        self.presenter.present(self.display)
         time.sleep(3)
         self.running = False
 
@@ -211,57 +476,149 @@ class Game:
     def defeat(self):
         """Handles the defeat condition, displaying the defeat screen and ending the game."""
 
+        if self.headless:
+            self.running = False
+            return
+
         # Display defeat screen and end game
         pg.mixer.music.pause()
-        pg.mixer.Sound('sounds/gameover.ogg').play() # play defeat screen sound
+        self.sounds.play("gameover") # play defeat screen sound
         self.display.blit(self.assets["background"], (0,0))
         text_surface = self.my_font.render('Defeat', False, (255, 0, 0))
         self.display.blit(text_surface, (0,0))
-        img = load_image("koopa/right/run/koopa.png")
-        self.display.blit(img, (130,10))
+        self.display.blit(self.assets["koopa"], (130,10))
 
-        self.screen.blit(pg.transform.scale(self.display,self.screen.get_size()),(0,0))
-        pg.display.update()
+        self.presenter.present(self.display)
 
         time.sleep(3)
         self.running = False
         
 
-    def render(self, render_scroll):
+    def render(self, render_scroll, alpha=1.0):
         """
         Renders the game entities and environment to the display surface.
 
         Args:
             render_scroll (tuple): The current scroll offset for rendering.
+            alpha (float, optional): How far between the previous and the current tick to draw the
+                entities, see `run()`. Defaults to 1.0, the current tick.
         """
         
-        # Render game entities and environment
-        self.clouds.render(self.display, offset=render_scroll)
+        # Render game entities and environment, remembering where they were drawn for run()
+        dirty = self.dirty
+        for rect in self.backdrop.render(self.display, offset=render_scroll, track=not dirty.full_update):
+            dirty.add(rect)
+        self.profiler.mark("background")
         self.tilemap.render(self.display, offset=render_scroll)
+        self.profiler.mark("tilemap")
 
-        self.player.render(self.display, offset=render_scroll)
+        dirty.add(self.player.render(self.display, offset=render_scroll, alpha=alpha))
 
-        for mob in self.harmfull_mobs: mob.render(self.display, offset=render_scroll)
-        for mob in self.harmless_mobs: mob.render(self.display, offset=render_scroll)
+        for mob in self.active_mobs:
+            if mob.alive: dirty.add(mob.render(self.display, offset=render_scroll, alpha=alpha))
+        for mob in self.harmless_mobs: dirty.add(mob.render(self.display, offset=render_scroll, alpha=alpha))
+        self.profiler.mark("entities")
 
 
     def run(self):
-        """The main game loop, running the game until the `running` attribute is False."""
+        """
+        The main game loop, running the game until the `running` attribute is False.
 
-        # Main game loop
-        while self.running:
-            self.display.blit(self.assets["background"], (0,0))
+        The simulation advances in fixed ticks of 1/TICK_RATE seconds, however many frames are drawn.
+        After a slow frame at most MAX_CATCHUP_TICKS ticks are run to catch up and the rest of the
+        backlog is dropped. Each frame draws the entities and camera between the last two ticks, by
+        how far real time has got into the next tick.
 
-            render_scroll = self.adjust_cam()
+        If the game was given a trace file, it is written when the loop ends, also when the window is closed.
+        """
+        try:
+            self._loop()
+        finally:
+            if self.trace is not None:
+                self.profiler.export(self.trace)
+
+    def _loop(self):
+        """Runs frames until the game ends, see `run()`."""
+        tick = 1 / TICK_RATE
+        lag = 0.0
+        previous = time.perf_counter()
+        profiler = self.profiler
 
-            self.update()
-            self.render(render_scroll)
+        # Main game loop
+        while self.running:
+            profiler.begin_frame()
+            now = time.perf_counter()
+            # Without a window there is nothing to keep in step with, so every frame is one tick
+            lag += tick if self.headless else min(now - previous, MAX_CATCHUP_TICKS * tick)
+            previous = now
 
             self.handle_events()
+            profiler.mark("events")
+            ticks = 0
+            while lag >= tick and self.running:
+                self.adjust_cam()
+                profiler.mark("camera")
+                self.update()
+                lag -= tick
+                ticks += 1
+            if not self.running:
+                break
+
+            alpha = lag / tick
+            render_scroll = self.interpolated_scroll(alpha)
+            # Only the entities and clouds need to reach the window, unless the camera moved,
+            # a tile changed, or the overlay is drawn over everything or was just hidden.
+            # A moving camera is a full redraw on purpose: the backdrop layers follow it at their own
+            # depth, so no part of the last frame can be shifted into place and reused
+            drawn = (render_scroll, self.tilemap.version, profiler.show_overlay)
+            if drawn != self.drawn or profiler.show_overlay:
+                self.dirty.full()
+            self.drawn = drawn
+
+            self.render(render_scroll, alpha)
             
-            self.screen.blit(pg.transform.scale(self.display,self.screen.get_size()),(0,0))
-
-            pg.display.update()
-            self.clock.tick(60)
-
-Game().run()
\ No newline at end of file
+            updated = self.dirty.draw(self.display, self.presenter)
+            profiler.mark("scale")
+            profiler.render(self.presenter.dest)
+            profiler.mark("overlay")
+
+            self.presenter.show(updated)
+            if self.time_to_first_frame is None:
+                self.time_to_first_frame = time.perf_counter() - self.started
+                profiler.startup["first frame"] = self.time_to_first_frame
+            self.sounds.end_frame()
+            profiler.mark("display")
+            if not self.headless and self.max_fps:
+                self.clock.tick(self.max_fps)
+            profiler.mark("wait")
+            profiler.end_frame(ticks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mario")
+    parser.add_argument("level", nargs="?", help="level number from 1 to 3, or the path of a map file")
+    parser.add_argument("--headless", action="store_true",
+                        help="simulate without a window or audio and report the tick rate")
+    parser.add_argument("--ticks", type=int, default=10000, help="ticks to simulate in headless mode")
+    parser.add_argument("--batch", action="store_true", help="move crowds of mobs with NumPy")
+    parser.add_argument("--stream", action="store_true", help="stream a .bmap level from disk around the camera")
+    parser.add_argument("--fps", type=int, default=MAX_FPS,
+                        help="most frames drawn per second, 0 for no cap (default: %(default)s)")
+    parser.add_argument("--trace", help="write the time of every frame phase to this .csv or .json file")
+    add_window_arguments(parser)
+    args = parser.parse_args()
+
+    if args.headless:
+        game = Game(args.level or 1, headless=True, batch_physics=args.batch, stream=args.stream, trace=args.trace)
+        ticks = 0
+        start = time.perf_counter()
+        while ticks < args.ticks and game.step(("right",)):
+            ticks += 1
+        elapsed = time.perf_counter() - start
+        print(f"ready after {game.startup_time * 1000:.0f} ms, {ticks} ticks in {elapsed:.2f}s ({ticks / max(elapsed, 1e-9):.0f} ticks/s), "
+              f"{len(game.active_mobs)} of {len(game.harmfull_mobs)} mobs active")
+        if args.trace:
+            game.profiler.export(args.trace)
+    else:
+        Game(args.level, batch_physics=args.batch, stream=args.stream, fps=args.fps, trace=args.trace,
+             window=args.window, scale_mode=args.scale_mode, fullscreen=args.fullscreen, vsync=args.vsync).run()
\ No newline at end of file
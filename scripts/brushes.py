@@ -0,0 +1,60 @@
+# Editor brushes, picked with the number keys in this order
+BRUSHES = ("pencil", "line", "rect", "fill", "select")
+
+
+def line_cells(start, end):
+    """
+    Finds the grid cells on a straight line without gaps, with Bresenham's line algorithm.
+
+    Args:
+        start (tuple): The (x, y) grid position the line starts at.
+        end (tuple): The (x, y) grid position the line ends at.
+
+    Returns:
+        list: The (x, y) grid position of every cell on the line, from start to end.
+    """
+    x, y = start
+    dx, dy = abs(end[0] - x), -abs(end[1] - y)
+    step_x = 1 if x < end[0] else -1
+    step_y = 1 if y < end[1] else -1
+    error = dx + dy
+    cells = [(x, y)]
+    while (x, y) != tuple(end):
+        twice = 2 * error
+        if twice >= dy:
+            error += dy
+            x += step_x
+        if twice <= dx:
+            error += dx
+            y += step_y
+        cells.append((x, y))
+    return cells
+
+
+def cell_bounds(start, end):
+    """
+    Returns the inclusive tile bounds of the rectangle with two grid positions as opposite corners.
+
+    Args:
+        start (tuple): One corner's (x, y) grid position.
+        end (tuple): The opposite corner's (x, y) grid position.
+
+    Returns:
+        tuple: The left, top, right and bottom tile coordinates.
+    """
+    return min(start[0], end[0]), min(start[1], end[1]), max(start[0], end[0]), max(start[1], end[1])
+
+
+def rect_cells(start, end):
+    """
+    Finds the grid cells of a filled rectangle.
+
+    Args:
+        start (tuple): One corner's (x, y) grid position.
+        end (tuple): The opposite corner's (x, y) grid position.
+
+    Returns:
+        list: The (x, y) grid position of every cell in the rectangle, column by column.
+    """
+    left, top, right, bottom = cell_bounds(start, end)
+    return [(x, y) for x in range(left, right + 1) for y in range(top, bottom + 1)]
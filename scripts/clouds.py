@@ -1,34 +1,43 @@
-import pygame as pg
 import random
 
-class Cloud:
-    def __init__(self, pos, img, speed, depth) -> None:
-        self.pos = list(pos)
-        self.img = img
-        self.speed = speed
-        self.depth = depth
-    
-    def update(self):
-        self.pos[0] += self.speed
-    
-    def render(self, surf, offset=(0,0)):
-        render_pos = (self.pos[0] - offset[0] * self.depth, self.pos[1] - offset[1] * self.depth)
-        surf.blit(self.img, (render_pos[0] % (surf.get_width() + self.img.get_width()) - self.img.get_width(), render_pos[1] % (surf.get_height() + self.img.get_height()) - self.img.get_height()))
-
-
-class Clouds:
-    def __init__(self, cloud_imges, count=16) -> None:
-        self.clouds = []
-
-        for i in range(count):
-            self.clouds.append(Cloud((random.random() * 99999, random.random() * 99999), random.choice(cloud_imges), random.random() * 0.05 + 0.05, random.random() * 0.6+0.2))
-        
-        self.clouds.sort(key=lambda x: x.depth)
-    
-    def update(self):
-        for cloud in self.clouds:
-            cloud.update()
-    
-    def render(self, surf, offset=(0,0)):
-        for cloud in self.clouds:
-            cloud.render(surf, offset=offset)
\ No newline at end of file
+from scripts.parallax import ParallaxLayer
+
+# Number of depth layers the clouds are spread over
+CLOUD_LAYERS = 3
+# Range of cloud depths, see ParallaxLayer.depth
+CLOUD_DEPTHS = (0.2, 0.8)
+
+
+def cloud_layers(cloud_imges, view_size, count=16, layers=CLOUD_LAYERS):
+    """
+    Scatters clouds at random over a number of parallax layers.
+
+    Every cloud gets a random position, image, speed and depth. The depths are rounded to the
+    middle of the layer they fall in, and the clouds in a layer drift at their average speed.
+
+    Args:
+        cloud_imges (list): The cloud images to pick from.
+        view_size (tuple): The size of the surface the clouds are drawn on.
+        count (int, optional): The number of clouds. Defaults to 16.
+        layers (int, optional): The number of depth layers. Defaults to CLOUD_LAYERS.
+
+    Returns:
+        list: The ParallaxLayers holding at least one cloud, from far to near.
+    """
+    low, high = CLOUD_DEPTHS
+    step = (high - low) / layers
+    groups = [[] for _ in range(layers)]
+    for i in range(count):
+        pos = (random.random() * 99999, random.random() * 99999)
+        img = random.choice(cloud_imges)
+        speed = random.random() * 0.05 + 0.05
+        depth = random.random() * (high - low) + low
+        groups[min(int((depth - low) / step), layers - 1)].append((img, pos, speed))
+
+    made = []
+    for i, group in enumerate(groups):
+        if group:
+            items = [(img, pos) for img, pos, _ in group]
+            speed = sum(speed for _, _, speed in group) / len(group)
+            made.append(ParallaxLayer(items, view_size, low + (i + 0.5) * step, speed))
+    return made
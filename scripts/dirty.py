@@ -0,0 +1,70 @@
+import pygame as pg
+
+# Above this share of the display, one full update is cheaper than many small ones
+FULL_UPDATE_SHARE = 0.5
+# More rects than this in one frame are merged into one
+MAX_RECTS = 64
+
+
+class DirtyRegions:
+    """
+    Collects the parts of the low resolution display that changed, and copies only those to the window.
+
+    Each frame `draw()` scales the changed parts onto the window surface and `Presenter.show()`
+    shows them, with room in between to draw on the window itself.
+
+    Rects are given in display coordinates. Every rect is drawn again on the next frame as well,
+    so the spot an entity drawn every frame moved away from gets cleared. Scrolling moves every pixel,
+    and the parallax layers each by their own amount, so callers mark the whole display with `full()`
+    when the camera moves and only frames with a still camera are drawn in part. When the presenter
+    scales by a fraction every update is a full one.
+
+    Attributes:
+        rects (list): The rects changed since the last `draw()`.
+        previous (list): The rects drawn by the last `draw()`, drawn once more to clear them.
+        full_update (bool): Whether the whole display is drawn on the next `draw()`.
+    """
+
+    def __init__(self):
+        """Initializes the tracker with a full update pending, so the first frame is drawn whole."""
+        self.rects = []
+        self.previous = []
+        self.full_update = True
+
+    def __bool__(self):
+        return self.full_update or bool(self.rects) or bool(self.previous)
+
+    def add(self, rect):
+        """
+        Marks a part of the display as changed.
+
+        Args:
+            rect (pygame.Rect): The changed area, or None for nothing, like the result of a blit that was skipped.
+        """
+        if rect:
+            self.rects.append(pg.Rect(rect))
+            if len(self.rects) > MAX_RECTS:
+                self.rects = [self.rects[0].unionall(self.rects)]
+
+    def full(self):
+        """Marks the whole display as changed."""
+        self.full_update = True
+
+    def draw(self, display, presenter):
+        """
+        Scales the changed parts of the display onto the window surface.
+
+        Args:
+            display (pygame.Surface): The low resolution surface everything is drawn on.
+            presenter (Presenter): The presenter that owns the window.
+
+        Returns:
+            list: The window rects that were drawn, to pass to `Presenter.show()`.
+        """
+        rects, self.previous, self.rects = self.rects + self.previous, self.rects, []
+        full, self.full_update = self.full_update, False
+
+        area = display.get_width() * display.get_height()
+        if full or not presenter.exact or sum(rect.w * rect.h for rect in rects) > area * FULL_UPDATE_SHARE:
+            return presenter.draw(display)
+        return presenter.draw(display, rects)
@@ -1,6 +1,10 @@
 import pygame as pg
 import random as rd
 
+# Farther than any mob can move in one tick, in pixels. Spatial hash queries search this much
+# around a rect, since other mobs may have moved since they were last stored in the hash.
+MOB_REACH = 8
+
 
 class PhysicsEntity():
     """
@@ -15,6 +19,7 @@ class PhysicsEntity():
         can_collide (bool): Indicates if the entity can participate in collision detection.
         mob_types (list): A list of entity types considered as mobs.
         recovering_blink (int): Counter used for the blinking effect during recovery.
+        prev_pos (list): The position at the start of the last tick, or None before the first tick.
         action (str): The current action of the entity (e.g., 'idle', 'run').
         anim_offset (tuple): The offset for the animation rendering.
         flip (bool): Indicates if the entity's image should be flipped horizontally.
@@ -32,6 +37,7 @@ class PhysicsEntity():
         # Types of entities considered as mobs
         self.mob_types = ["goomba", "koopa", "shell"]
         self.recovering_blink = 0  # Used for blinking effect during recovery
+        self.prev_pos = None  # Position at the start of the last tick, see snapshot()
 
         self.action = ""
         self.anim_offset = (-3, -3)
@@ -55,10 +61,12 @@ class PhysicsEntity():
             action (str): The action to set for the entity.
         """
         # Change the current action and update the animation accordingly
+        # Mobs follow the game's shared animation clock so crowds animate in lockstep
         if action != self.action:
             self.action = action
+            clock = self.game.anim_clock if self.type in self.mob_types else None
             self.animation = self.game.assets[self.type +
-                                              "/" + self.action].copy()
+                                              "/" + self.action].copy(clock)
 
     def rect(self):
         """
@@ -82,23 +90,32 @@ class PhysicsEntity():
         # Update entity state, including position, collisions, and animations
         # Handle vertical and horizontal movements separately for precise collision detection
         vertical_collision_mob, vertical_collision_player = False, False
+        # Only mobs the broadphase found near the player need to test against it
+        near_player = self.type in self.mob_types and self in self.game.near_player
         self.collisions = {"up": False, "down": False,
                            "left": False, "right": False}
         frame_movement = (movement[0]+self.velocity[0],
                           movement[1] + self.velocity[1])
 
         # Checks the horizontal and vertical movement and collsions one by one
+        before = self.rect()
         self.pos[1] += frame_movement[1]
-        if self.type in self.mob_types and self.game.player.recovering == 0:
+        if near_player and self.game.player.recovering == 0:
             if self.check_player_collision("vertical"):
                 vertical_collision_mob = True
         if self.type == "player" and self.game.player.recovering == 0:
             if self.check_mob_collision("vertical"):
                 vertical_collision_player = True
 
+        # Tiles the entity passed over during the move count as well, so fast entities can not tunnel
         entety_rect = self.rect()
-        for rect in tilemap.physics_rects_around(self.pos):
-            if entety_rect.colliderect(rect) and self.can_colide:
+        sweep = before.union(entety_rect)
+        # Nearest rows first, so the first tile hit is the one the entity reached first
+        for rect in tilemap.physics_rects_in(sweep, bottom_up=frame_movement[1] < 0):
+            if not self.can_colide:
+                break
+            passed = rect.top >= before.bottom if frame_movement[1] > 0 else rect.bottom <= before.top
+            if entety_rect.colliderect(rect) or (passed and sweep.colliderect(rect)):
                 if frame_movement[1] > 0:
                     entety_rect.bottom = rect.top
                     self.collisions["down"] = True
@@ -108,24 +125,27 @@ class PhysicsEntity():
                     entety_rect.top = rect.bottom
                     self.collisions["up"] = True
 
-                    rect_pos = [(rect[0]/self.game.tilemap.tile_size),
-                                (rect[1]/self.game.tilemap.tile_size)]
-
-                    if rect_pos in self.game.tilemap.randoms and self.type == "player":
-                        pos = str(int(rect_pos[0]))+";"+str(int(rect_pos[1]))
-                        Randoms.all_randoms[pos].activate(pos)
+                    # Bumping an interactive tile from below activates it
+                    if self.type == "player":
+                        block = self.game.interactive.get((rect.x // tilemap.tile_size, rect.y // tilemap.tile_size))
+                        if block is not None:
+                            block.activate()
 
                 self.pos[1] = entety_rect.y
+                sweep = before.union(entety_rect)
 
+        before = self.rect()
         self.pos[0] += frame_movement[0]
-        if self.type in self.mob_types and vertical_collision_mob != True:
+        if near_player and vertical_collision_mob != True:
             self.check_player_collision("horisontal")
         if self.type == "player" and vertical_collision_player != True:
             self.check_mob_collision("horisontal")
 
         entety_rect = self.rect()
-        for rect in tilemap.physics_rects_around(self.pos):
-            if entety_rect.colliderect(rect):
+        sweep = before.union(entety_rect)
+        for rect in tilemap.physics_rects_in(sweep):
+            passed = rect.left >= before.right if frame_movement[0] > 0 else rect.right <= before.left
+            if entety_rect.colliderect(rect) or (passed and sweep.colliderect(rect)):
                 if frame_movement[0] > 0:
                     entety_rect.right = rect.left
                     self.collisions["right"] = True
@@ -134,6 +154,7 @@ class PhysicsEntity():
                     self.collisions["left"] = True
 
                 self.pos[0] = entety_rect.x
+                sweep = before.union(entety_rect)
 
         if movement[0] > 0:
             self.flip = False
@@ -147,43 +168,50 @@ class PhysicsEntity():
 
         self.animation.update()
 
-    def render(self, surf, offset=(0, 0)):
+    def snapshot(self):
+        """Remembers the current position as where the entity started this tick, for render interpolation."""
+        if self.prev_pos is None:
+            self.prev_pos = list(self.pos)
+        else:
+            self.prev_pos[0], self.prev_pos[1] = self.pos
+
+    def render(self, surf, offset=(0, 0), alpha=1.0):
         """
         Renders the entity on the given surface, applying the specified offset.
         
         Args:
             surf (pygame.Surface): The surface to render the entity on.
             offset (tuple): The offset to apply to the entity's position.
+            alpha (float, optional): How far between its position at the start of the last tick and
+                its current position to draw the entity. Defaults to 1.0, the current position.
+
+        Returns:
+            pygame.Rect: The area drawn on, or None if the entity is blinked out.
         """
+        # Draw between the last two ticks, counting back from the current position so alpha 1 is exact
+        x, y = self.pos
+        if self.prev_pos is not None and alpha != 1.0:
+            back = 1 - alpha
+            x -= (x - self.prev_pos[0]) * back
+            y -= (y - self.prev_pos[1]) * back
+        draw_pos = (x - offset[0] + self.anim_offset[0], y - offset[1] + self.anim_offset[1])
+
         # Render the entity on the given surface, applying offset for camera movement
         # Includes handling for the blinking effect during recovery
         if self.type == "player" and self.recovering > 9:
             if self.recovering == 0:
-                adjustedR = self.rect()
-                adjustedR.x = adjustedR.x - offset[0]
-                adjustedR.y = adjustedR.y - offset[1]
-                surf.blit(pg.transform.flip(self.animation.img(), self.flip, False), (
-                    self.pos[0] - offset[0] + self.anim_offset[0], self.pos[1] - offset[1] + self.anim_offset[1]))
+                return surf.blit(self.animation.img(self.flip), draw_pos)
             else:
-                adjustedR = self.rect()
-                adjustedR.x = adjustedR.x - offset[0]
-                adjustedR.y = adjustedR.y - offset[1]
                 if self.recovering_blink < 10:
                     self.recovering_blink += 1
                     return
                 if self.recovering_blink < 20:
-                    surf.blit(pg.transform.flip(self.animation.img(), self.flip, False), (
-                        self.pos[0] - offset[0] + self.anim_offset[0], self.pos[1] - offset[1] + self.anim_offset[1]))
                     self.recovering_blink += 1
-                    return
+                    return surf.blit(self.animation.img(self.flip), draw_pos)
                 else:
                     self.recovering_blink = 0
         else:
-            adjustedR = self.rect()
-            adjustedR.x = adjustedR.x - offset[0]
-            adjustedR.y = adjustedR.y - offset[1]
-            surf.blit(pg.transform.flip(self.animation.img(), self.flip, False), (
-                self.pos[0] - offset[0] + self.anim_offset[0], self.pos[1] - offset[1] + self.anim_offset[1]))
+            return surf.blit(self.animation.img(self.flip), draw_pos)
 
 
 class Player(PhysicsEntity):
@@ -239,9 +267,10 @@ class Player(PhysicsEntity):
         Args:
             direction (str): The direction of the collision to check ('vertical' or 'horizontal').
         """
-        # Detect and handle collisions with mobs
-        for mob in self.game.harmfull_mobs:
-            my_rect, mob_rect = self.rect(), mob.rect()
+        # Detect and handle collisions with the mobs the spatial hash finds around the player
+        my_rect = self.rect()
+        for mob in self.game.mob_hash.query(my_rect):
+            mob_rect = mob.rect()
             if my_rect.colliderect(mob_rect) == True and direction == "vertical":
                 self.game.player.velocity[1] = -2
                 self.game.player.recovering = 9
@@ -250,9 +279,8 @@ class Player(PhysicsEntity):
                     mob.shell()
                 elif mob.type == "shell":
                     mob.direction = 0
-                else:
-                    self.game.harmfull_mobs.remove(mob)
-                    pg.mixer.Sound("sounds/kick.wav").play()
+                elif self.game.entities.despawn(mob):
+                    self.game.sounds.play("kick")
 
             elif my_rect.colliderect(mob_rect) == True and direction == "horisontal" and not self.game.player.recovering:
                 if mob.type == "shell":
@@ -270,7 +298,7 @@ class Player(PhysicsEntity):
     def sizeup(self):
         """Handles the player growth effect after collecting a power-up."""
         # Handle player growth effect after eating a sizeup shroom
-        pg.mixer.Sound("sounds/powerup.ogg").play()
+        self.game.sounds.play("powerup")
         if self.size_state == "small":
             self.size_state = "big"
             self.size[1] = self.size[1]+self.size[1]
@@ -297,13 +325,7 @@ class Sizeup(PhysicsEntity):
         self.direction = direction
         self.velocity[1] = -0.4
         self.can_colide = False
-
-        def generateID():
-            while True:
-                new_id = rd.randint(1, 10000)
-                if not any(mob.id == new_id for mob in self.game.harmless_mobs):
-                    return new_id
-        self.id = generateID()
+        self.game.entities.spawn(self, "harmless")
 
         if self.direction == "random":
             if rd.randint(0, 1) == 0:
@@ -326,13 +348,9 @@ class Sizeup(PhysicsEntity):
                 self.direction = 1
         if self.rect().colliderect(self.game.player.rect()) and self.game.player.size_state == "small":
             self.game.player.sizeup()
-            for mob in self.game.harmless_mobs:
-                if mob.id == self.id:
-                    self.game.harmless_mobs.remove(mob)
+            self.game.entities.despawn(self)
         elif self.rect().colliderect(self.game.player.rect()):
-            for mob in self.game.harmless_mobs:
-                if mob.id == self.id:
-                    self.game.harmless_mobs.remove(mob)
+            self.game.entities.despawn(self)
 
 
 class Goomba(PhysicsEntity):
@@ -341,18 +359,11 @@ class Goomba(PhysicsEntity):
     def __init__(self, game, pos, size) -> None:
         # Randomly assign initial movement direction
         super().__init__(game, "goomba", pos, size)
-
-        def generateID():
-            while True:
-                new_id = rd.randint(1, 10000)
-                if not any(mob.id == new_id for mob in self.game.harmfull_mobs):
-                    return new_id
-        self.id = generateID()
-        self.game.harmfull_mobs.append(self)
         self.action = "run"
 
         self.pos = list(pos)
         self.size = list(size)
+        self.game.entities.spawn(self, "harmfull")
         self.direction = "random"
 
         if self.direction == "random":
@@ -380,14 +391,8 @@ class Goomba(PhysicsEntity):
         if my_rect.colliderect(player_rect) == True and direction == "vertical":
             self.game.player.velocity[1] = -2
             self.game.player.recovering = 9
-            for mob in self.game.harmfull_mobs:
-                if mob.id == self.id:
-                    self.game.harmfull_mobs.remove(mob)
-                    pg.mixer.Sound("sounds/kick.wav").play()
-
-                elif my_rect.colliderect(player_rect) == True and direction == "horisontal" and not self.game.player.recovering:
-                    self.game.player.sizedown()
-                    self.game.player.recovering = 100
+            if self.game.entities.despawn(self):
+                self.game.sounds.play("kick")
 
 
 class Koopa(PhysicsEntity):
@@ -395,18 +400,11 @@ class Koopa(PhysicsEntity):
     # Represents Koopa enemies, with unique behavior for turning into a shell
     def __init__(self, game, pos, size) -> None:
         super().__init__(game, "koopa", pos, size)
-
-        def generateID():
-            while True:
-                new_id = rd.randint(1, 10000)
-                if not any(mob.id == new_id for mob in self.game.harmfull_mobs):
-                    return new_id
-        self.id = generateID()
-        self.game.harmfull_mobs.append(self)
         self.action = "run"
 
         self.pos = list(pos)
         self.size = list(size)
+        self.game.entities.spawn(self, "harmfull")
         self.direction = "random"
 
         if self.direction == "random":
@@ -436,20 +434,16 @@ class Koopa(PhysicsEntity):
         if my_rect.colliderect(player_rect) == True and direction == "vertical":
             self.game.player.velocity[1] = -2
             self.game.recovering = 9
-            for mob in self.game.harmfull_mobs:
-                if mob.id == self.id:
-                    self.shell()
+            self.shell()
         elif my_rect.colliderect(player_rect) == True and direction == "horisontal" and not self.game.player.recovering:
             self.game.player.sizedown()
             self.game.player.recovering = 100
 
     def shell(self):
-        # Transform Koopa into a shell
-        Shell(self.game, (self.pos[0], self.pos[1]+5), (10, 10))
-        for mob in self.game.harmfull_mobs:
-            if mob.id == self.id:
-                self.game.harmfull_mobs.remove(mob)
-                pg.mixer.Sound("sounds/kick.wav").play()
+        # Transform Koopa into a shell, unless it already turned into one this tick
+        if self.game.entities.despawn(self):
+            Shell(self.game, (self.pos[0], self.pos[1]+5), (10, 10))
+            self.game.sounds.play("kick")
 
 
 class Shell(PhysicsEntity):
@@ -457,17 +451,10 @@ class Shell(PhysicsEntity):
     # Represents Koopa shells, which can move and cause damage
     def __init__(self, game, pos, size) -> None:
         super().__init__(game, "shell", pos, size)
-
-        def generateID():
-            while True:
-                new_id = rd.randint(1, 10000)
-                if not any(mob.id == new_id for mob in self.game.harmfull_mobs):
-                    return new_id
-        self.id = generateID()
-        self.game.harmfull_mobs.append(self)
         self.direction = 0
         self.pos = list(pos)
         self.size = list(size)
+        self.game.entities.spawn(self, "harmfull")
 
     def update(self, tilemap, movement=(0, 0)):
         # Update shell state, handling movement and collisions
@@ -481,6 +468,15 @@ class Shell(PhysicsEntity):
         if self.collisions["left"]:
             self.direction = 1
 
+        self.knock_out_mobs()
+
+    def knock_out_mobs(self):
+        # A moving shell knocks out every goomba and koopa it runs into
+        my_rect = self.rect()
+        for mob in self.game.mob_hash.query(my_rect, MOB_REACH):
+            if mob.type != "shell" and my_rect.colliderect(mob.rect()) and self.game.entities.despawn(mob):
+                self.game.sounds.play("kick")
+
     def check_player_collision(self, direction):
         # Detect and handle collisions with the player
         if self.direction != 0:
@@ -504,50 +500,47 @@ class Randoms:
 
     These objects typically represent elements in the game world that, when interacted with, can yield power-ups, coins, or other items to the player. Activation of these objects changes their state to indicate that they have been used and potentially spawn items or effects.
 
+    Every box registers itself in its game's `interactive` dictionary under its grid position, so
+    nothing carries over from one game to the next.
+
     Attributes:
         game (Game): The game instance this random object belongs to.
-        pos (str): The position of the random object within the tilemap, represented as a string in the format 'x;y'.
+        cell (tuple): The (x, y) grid position of the random object.
+        pos (str): The same position in the 'x;y' format.
         activ (bool): Indicates whether the random object has been activated.
         reward (str): The type of reward that the random object yields upon activation. Defaults to 'random' indicating that the reward can vary.
     """
 
-    all_randoms = {}
-    """Class-level dictionary tracking all random objects by their positions."""
-
-    def __init__(self, game, pos, reward="random"):
+    def __init__(self, game, cell, reward="random"):
         """
         Initializes a new random interactive object with a specified position and reward.
         
         Args:
             game (Game): The game instance this object belongs to.
-            pos (str): The position of the object within the tilemap, in 'x;y' format.
+            cell (tuple): The (x, y) grid position of the object.
             reward (str, optional): The type of reward to yield. Defaults to 'random'.
         """
         self.game = game
-        self.pos = pos
+        self.cell = (int(cell[0]), int(cell[1]))
+        self.pos = f"{self.cell[0]};{self.cell[1]}"
         self.activ = False
         self.reward = reward
 
-        # Register the new object in the all_randoms dictionary
-        Randoms.all_randoms[self.pos] = self
+        # Register the new object with the game's interactive tiles
+        game.interactive[self.cell] = self
 
-    def activate(self, pos):
+    def activate(self):
         """
         Activates the random object, triggering its reward and marking it as used.
 
         This method changes the object's state to indicate that it has been activated. Depending on the implementation, this might involve changing the object's appearance in the game world, spawning items or effects, and potentially altering the game's tilemap.
-
-        Args:
-            pos (str): The position of the object being activated, in 'x;y' format.
         """
         if not self.activ:
             # Example: spawn a size-up power-up
-            self.game.harmless_mobs.append(Sizeup(self.game, pos, (14, 14)))
+            Sizeup(self.game, self.pos, (14, 14))
             # Change the object's image to indicate it's been activated
             self.img = self.game.assets["random2"]
             self.activ = True
 
             # Update the tilemap to reflect the change in object type
-            for key in self.game.tilemap.tilemap:
-                if key == self.pos:
-                    self.game.tilemap.tilemap[key]["type"] = "random2"
+            self.game.tilemap.set_tile(self.cell, "random2")
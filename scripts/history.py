@@ -0,0 +1,323 @@
+import json
+import os
+import queue
+import threading
+
+from scripts.tilemap import write_map
+
+# Appended to a map's path to name the journal of edits not yet saved into it
+JOURNAL_EXTENSION = ".journal"
+# Edits kept for undo, the oldest ones are forgotten first
+UNDO_LIMIT = 500
+
+
+class Edit:
+    """
+    One undoable change to a tilemap, like a brush stroke: any number of grid and offgrid tile changes.
+
+    Attributes:
+        tiles (dict): The (old type, new type) of every changed cell by grid position, None for empty.
+        added (list): The offgrid tiles placed.
+        removed (list): The offgrid tiles removed.
+    """
+
+    def __init__(self):
+        """Initializes an edit that changes nothing yet."""
+        self.tiles = {}
+        self.added = []
+        self.removed = []
+
+    def __bool__(self):
+        return bool(self.added or self.removed) or any(old != new for old, new in self.tiles.values())
+
+    def set_tile(self, pos, old, new):
+        """
+        Records a grid tile change that has already been made.
+
+        Args:
+            pos (tuple): The (x, y) grid position.
+            old (str): The tile type that was there, or None.
+            new (str): The tile type there now, or None.
+        """
+        pos = (int(pos[0]), int(pos[1]))
+        first = self.tiles.get(pos, (old, None))[0]  # Painting a cell twice still undoes to what was first there
+        self.tiles[pos] = (first, new)
+
+    def set_tiles(self, changed):
+        """
+        Records grid tile changes that have already been made, like the result of `Tilemap.set_tiles()`.
+
+        Args:
+            changed (dict): The (old type, new type) of every changed cell by grid position.
+        """
+        for pos, (old, new) in changed.items():
+            self.set_tile(pos, old, new)
+
+    def add_offgrid(self, tile):
+        """Records an offgrid tile that has already been placed."""
+        self.added.append(tile)
+
+    def remove_offgrid(self, tile):
+        """Records an offgrid tile that has already been removed."""
+        for i, other in enumerate(self.added):
+            if other is tile:
+                del self.added[i]  # Placed and removed in the same edit, as if it never was
+                return
+        self.removed.append(tile)
+
+    def apply(self, tilemap):
+        """Makes the edit again on a tilemap, after it was reverted."""
+        self._change(tilemap, {pos: new for pos, (_, new) in self.tiles.items()}, self.removed, self.added)
+
+    def revert(self, tilemap):
+        """Undoes the edit on a tilemap."""
+        self._change(tilemap, {pos: old for pos, (old, _) in self.tiles.items()}, self.added, self.removed)
+
+    def _change(self, tilemap, tiles, remove, add):
+        """Sets grid tiles, removes offgrid tiles and places the ones in `add` again as new tiles."""
+        tilemap.set_tiles(tiles)
+        for tile in remove:
+            tilemap.remove_offgrid(tile)
+        add[:] = [tilemap.add_offgrid(tile["type"], tile["pos"]) for tile in add]
+
+    def record(self, undo=False):
+        """
+        Returns the edit, or undoing it, as a journal record that can be written as JSON.
+
+        Records hold the new type of every cell rather than the change, so replaying one twice is harmless.
+
+        Args:
+            undo (bool, optional): Whether to describe undoing the edit. Defaults to False.
+
+        Returns:
+            dict: The "tiles" as [x, y, type] and the offgrid tiles to "add" and "remove" as [type, x, y].
+        """
+        new = 0 if undo else 1
+        added, removed = (self.removed, self.added) if undo else (self.added, self.removed)
+        return {"tiles": [[pos[0], pos[1], types[new]] for pos, types in self.tiles.items() if types[0] != types[1]],
+                "add": [[tile["type"], tile["pos"][0], tile["pos"][1]] for tile in added],
+                "remove": [[tile["type"], tile["pos"][0], tile["pos"][1]] for tile in removed]}
+
+
+def replay(tilemap, record):
+    """
+    Makes the change described by a journal record on a tilemap.
+
+    Offgrid tiles are matched by type and position. An offgrid tile is not placed if the same one
+    is already there, so a record that made it into the map before a crash is not applied twice.
+
+    Args:
+        tilemap (Tilemap): The tilemap to change.
+        record (dict): The record, as returned by `Edit.record()`.
+    """
+    tilemap.set_tiles({(x, y): tile_type for x, y, tile_type in record["tiles"]})
+    for tile_type, x, y in record["remove"]:
+        for tile in tilemap.offgrid_at((x, y), include_markers=True):
+            if tile["type"] == tile_type and tuple(tile["pos"]) == (x, y):
+                tilemap.remove_offgrid(tile)
+                break
+    for tile_type, x, y in record["add"]:
+        found = tilemap.offgrid_at((x, y), include_markers=True)
+        if not any(tile["type"] == tile_type and tuple(tile["pos"]) == (x, y) for tile in found):
+            tilemap.add_offgrid(tile_type, [x, y])
+
+
+def recover(tilemap, path):
+    """
+    Replays the journal of a map onto a tilemap, bringing back the edits made since the map was last saved.
+
+    A last line cut short by a crash is skipped.
+
+    Args:
+        tilemap (Tilemap): The tilemap, with the map at `path` loaded or empty if there is none.
+        path (str): The map's path.
+
+    Returns:
+        int: The number of records replayed.
+    """
+    try:
+        with open(path + JOURNAL_EXTENSION) as file:
+            lines = file.read().splitlines()
+    except FileNotFoundError:
+        return 0
+    count = 0
+    for i, line in enumerate(lines):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            if i == len(lines) - 1:
+                break
+            raise
+        replay(tilemap, record)
+        count += 1
+    return count
+
+
+class Journal:
+    """
+    Saves the edits to a map on a background thread, so saving never holds up the editor.
+
+    Every edit is appended to the journal file next to the map as one JSON line. Now and then the
+    whole map is compacted: a snapshot is written over the map file, which is replaced in one step,
+    and the journal is emptied. Appends and compactions are done in the order they were asked for,
+    so the map plus the journal always hold every edit. Errors on the thread are raised again by the
+    next call from the editor.
+
+    Attributes:
+        path (str): The map's path.
+        journal_path (str): The journal's path.
+        pending (int): The number of records appended since the last compaction was asked for.
+    """
+
+    def __init__(self, path, pending=0):
+        """
+        Opens the journal and starts the thread writing it.
+
+        Args:
+            path (str): The map's path.
+            pending (int, optional): The number of records already in the journal. Defaults to 0.
+        """
+        self.path = path
+        self.journal_path = path + JOURNAL_EXTENSION
+        self.pending = pending
+        self.error = None
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self.thread.start()
+
+    def append(self, record):
+        """
+        Appends a record to the journal.
+
+        Args:
+            record (dict): The record, as returned by `Edit.record()`.
+        """
+        self._check()
+        self.jobs.put(("append", record))
+        self.pending += 1
+
+    def compact(self, snapshot):
+        """
+        Writes a snapshot over the map file and empties the journal.
+
+        Args:
+            snapshot (dict): The map with every appended record in it, as returned by `Tilemap.snapshot()`.
+        """
+        self._check()
+        self.jobs.put(("compact", snapshot))
+        self.pending = 0
+
+    def close(self):
+        """Waits for everything asked for to be written and stops the thread."""
+        self.jobs.put(None)
+        self.thread.join()
+        self._check()
+
+    def _check(self):
+        """Raises the error the thread ran into, if any."""
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _run(self):
+        """Writes the jobs in order until `close()` is called."""
+        file = open(self.journal_path, "a")
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+                kind, data = job
+                try:
+                    if kind == "append":
+                        file.write(json.dumps(data) + "\n")
+                        # Flush once a burst of edits is written rather than after every line
+                        if self.jobs.empty():
+                            file.flush()
+                            os.fsync(file.fileno())
+                    else:
+                        write_map(data, self.path)
+                        file.close()
+                        file = open(self.journal_path, "w")
+                except OSError as error:
+                    self.error = error
+        finally:
+            file.close()
+
+
+class History:
+    """
+    The undo and redo stacks of an editor, with every edit, undo and redo written to a journal.
+
+    Attributes:
+        journal (Journal): Where the changes are written, or None.
+        limit (int): The number of edits kept for undo.
+        undone (list): The edits that can be undone, the last one made last.
+        redone (list): The edits that can be redone, the last one undone last.
+    """
+
+    def __init__(self, journal=None, limit=UNDO_LIMIT):
+        """
+        Initializes empty stacks.
+
+        Args:
+            journal (Journal, optional): Where the changes are written. Defaults to None.
+            limit (int, optional): The number of edits kept for undo. Defaults to UNDO_LIMIT.
+        """
+        self.journal = journal
+        self.limit = limit
+        self.undone = []
+        self.redone = []
+
+    def push(self, edit):
+        """
+        Records an edit that has been made. Edits that change nothing are dropped.
+
+        Args:
+            edit (Edit): The edit.
+        """
+        if not edit:
+            return
+        self.undone.append(edit)
+        del self.undone[:-self.limit]
+        self.redone.clear()
+        if self.journal is not None:
+            self.journal.append(edit.record())
+
+    def undo(self, tilemap):
+        """
+        Undoes the last edit.
+
+        Args:
+            tilemap (Tilemap): The tilemap the edit was made on.
+
+        Returns:
+            Edit: The edit undone, or None if there was nothing to undo.
+        """
+        if not self.undone:
+            return None
+        edit = self.undone.pop()
+        edit.revert(tilemap)
+        self.redone.append(edit)
+        if self.journal is not None:
+            self.journal.append(edit.record(undo=True))
+        return edit
+
+    def redo(self, tilemap):
+        """
+        Makes the last undone edit again.
+
+        Args:
+            tilemap (Tilemap): The tilemap the edit was made on.
+
+        Returns:
+            Edit: The edit made again, or None if there was nothing to redo.
+        """
+        if not self.redone:
+            return None
+        edit = self.redone.pop()
+        edit.apply(tilemap)
+        self.undone.append(edit)
+        if self.journal is not None:
+            self.journal.append(edit.record())
+        return edit
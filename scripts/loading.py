@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame as pg
+
+# Threads decoding assets and parsing the level while the loading screen is shown
+LOAD_WORKERS = 4
+LOADING_BACKGROUND = (92, 148, 252)
+LOADING_BAR_COLOR = (255, 255, 255)
+LOADING_BAR_SIZE = (160, 8)
+
+
+class Loader:
+    """
+    Runs startup jobs, like decoding images and sounds or parsing a map, on a pool of threads.
+
+    Jobs must not touch the window or the display: converting surfaces and anything else that needs
+    the display is left to the main thread once `done` is True. Errors raised by a job are raised
+    again by `wait()`.
+
+    Attributes:
+        jobs (list): The concurrent.futures.Future of every submitted job.
+    """
+
+    def __init__(self, workers=LOAD_WORKERS):
+        """
+        Starts the thread pool.
+
+        Args:
+            workers (int, optional): The number of threads. Defaults to LOAD_WORKERS.
+        """
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="load")
+        self.jobs = []
+
+    def submit(self, func, *args):
+        """
+        Runs a function on the pool.
+
+        Args:
+            func (callable): The job.
+            *args: The arguments to call it with.
+
+        Returns:
+            concurrent.futures.Future: The job's future, holding its result once it is done.
+        """
+        job = self.pool.submit(func, *args)
+        self.jobs.append(job)
+        return job
+
+    @property
+    def progress(self):
+        """float: The share of submitted jobs that are done, from 0 to 1."""
+        if not self.jobs:
+            return 1.0
+        return sum(job.done() for job in self.jobs) / len(self.jobs)
+
+    @property
+    def done(self):
+        """bool: Whether every submitted job is done."""
+        return all(job.done() for job in self.jobs)
+
+    def wait(self):
+        """Waits for every job, raising the first error a job ran into, and stops the pool."""
+        try:
+            for job in self.jobs:
+                job.result()
+        finally:
+            self.pool.shutdown()
+
+
+def render_loading(surf, progress):
+    """
+    Draws the loading screen, a progress bar in the middle of the surface.
+
+    Args:
+        surf (pygame.Surface): The surface to draw on.
+        progress (float): How much is loaded, from 0 to 1.
+    """
+    surf.fill(LOADING_BACKGROUND)
+    bar = pg.Rect((0, 0), LOADING_BAR_SIZE)
+    bar.center = surf.get_rect().center
+    pg.draw.rect(surf, LOADING_BAR_COLOR, bar, 1)
+    pg.draw.rect(surf, LOADING_BAR_COLOR, (bar.x, bar.y, int(bar.w * progress), bar.h))
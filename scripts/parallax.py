@@ -0,0 +1,185 @@
+import pygame as pg
+
+# Fill color marking the transparent parts of a layer strip
+STRIP_COLORKEY = (255, 0, 255)
+
+
+class ParallaxLayer:
+    """
+    One depth layer of the backdrop, drawn once onto a strip that wraps around.
+
+    Every item of the layer is drawn onto the strip when the layer is made, so a frame costs at
+    most four blits of the strip whatever the number of items, and copies that miss the view are
+    not blitted at all. The strip is one view plus the widest item across, so it always covers the
+    view with two copies side by side. Layers that wrap vertically are also one view plus the
+    tallest item high and are drawn in two rows, other layers are drawn once at their own height,
+    like hills standing on the bottom of the view.
+
+    Attributes:
+        depth (float): How fast the layer follows the camera, 0 for not at all and 1 for like the level.
+        speed (float): How many pixels the layer drifts to the right every tick.
+        wrap_y (bool): Whether the layer also wraps vertically.
+        strip (pygame.Surface): The pre-drawn layer.
+        period (tuple): The width and height after which the layer repeats.
+        rects (list): The area of every item on the strip, including wrapped copies.
+        drift (float): How far the layer has drifted since it was made.
+        origin (tuple): Where the strip was drawn last frame, or None.
+    """
+
+    def __init__(self, items, view_size, depth, speed=0.0, wrap_y=True):
+        """
+        Draws the items of a layer onto its strip.
+
+        Args:
+            items (list): The (image, (x, y)) of every item. Positions past the period wrap around.
+            view_size (tuple): The size of the surface the layer is drawn on.
+            depth (float): How fast the layer follows the camera.
+            speed (float, optional): How many pixels the layer drifts every tick. Defaults to 0.
+            wrap_y (bool, optional): Whether the layer also wraps vertically. Defaults to True.
+        """
+        self.depth = depth
+        self.speed = speed
+        self.wrap_y = wrap_y
+        self.drift = 0.0
+        self.origin = None
+
+        width = view_size[0] + max((img.get_width() for img, _ in items), default=0)
+        if wrap_y:
+            height = view_size[1] + max((img.get_height() for img, _ in items), default=0)
+        else:
+            height = max((int(pos[1]) + img.get_height() for img, pos in items), default=0)
+        self.period = (width, height)
+
+        self.strip = pg.Surface((max(width, 1), max(height, 1)))
+        self.strip.fill(STRIP_COLORKEY)
+        bounds = self.strip.get_rect()
+        self.rects = []
+        for img, pos in items:
+            x = int(pos[0]) % width
+            y = int(pos[1]) % height if wrap_y else int(pos[1])
+            # Items hanging over the right or bottom edge are drawn again on the other side
+            for dx in ((0, -width) if x + img.get_width() > width else (0,)):
+                for dy in ((0, -height) if wrap_y and y + img.get_height() > height else (0,)):
+                    rect = self.strip.blit(img, (x + dx, y + dy))
+                    if rect.colliderect(bounds):
+                        self.rects.append(rect)
+        self.strip.set_colorkey(STRIP_COLORKEY, pg.RLEACCEL)
+
+    def update(self):
+        """Drifts the layer by one tick."""
+        self.drift += self.speed
+
+    def render(self, surf, offset=(0, 0), track=True):
+        """
+        Draws the layer.
+
+        Args:
+            surf (pygame.Surface): The surface to draw on.
+            offset (tuple): The camera scroll.
+            track (bool, optional): Whether to work out what changed. Frames that redraw the whole
+                surface anyway can skip it. Defaults to True.
+
+        Returns:
+            list: The areas of the surface that changed since the last frame, which are only the
+                items' old and new spots, and only in frames where the layer moved.
+        """
+        origin = self._origin(offset)
+        for left, top in self._copies(origin, surf.get_size()):
+            surf.blit(self.strip, (left, top))
+
+        if origin == self.origin:
+            return []
+        changed = []
+        if track:
+            changed = self._rects_at(origin, surf.get_rect())
+            if self.origin is not None:
+                changed += self._rects_at(self.origin, surf.get_rect())
+        self.origin = origin
+        return changed
+
+    def _origin(self, offset):
+        """Returns the top left corner of the strip's first copy for a camera scroll."""
+        width, height = self.period
+        x = int((self.drift - offset[0] * self.depth) % width) - width
+        if self.wrap_y:
+            return x, int(-offset[1] * self.depth % height) - height
+        return x, int(-offset[1] * self.depth)
+
+    def _copies(self, origin, size):
+        """Returns the top left corners of the copies of the strip that reach onto a surface of a size."""
+        width, height = self.period
+        # The first copy always reaches the surface, the next one only if the first ends before it does
+        columns = (origin[0], origin[0] + width) if origin[0] + width < size[0] else (origin[0],)
+        if not self.wrap_y:
+            rows = (origin[1],)
+        elif origin[1] + height < size[1]:
+            rows = (origin[1], origin[1] + height)
+        else:
+            rows = (origin[1],)
+        return [(left, top) for left in columns for top in rows]
+
+    def _rects_at(self, origin, bounds):
+        """Returns where the items are on a surface with the strip drawn at an origin, clipped to its bounds."""
+        found = []
+        for left, top in self._copies(origin, bounds.size):
+            for rect in self.rects:
+                rect = rect.move(left, top).clip(bounds)
+                if rect:
+                    found.append(rect)
+        return found
+
+
+class Parallax:
+    """
+    The backdrop behind the level: a background image and any number of depth layers in front of it.
+
+    A background made of a single color is filled instead of blitted.
+
+    Attributes:
+        background (pygame.Surface): The image drawn behind every layer.
+        color (pygame.Color): The background's only color, or None if it has more than one.
+        layers (list): The ParallaxLayers, from far to near.
+    """
+
+    def __init__(self, background, layers=()):
+        """
+        Initializes the backdrop.
+
+        Args:
+            background (pygame.Surface): The image drawn behind every layer, at the top left corner.
+            layers (iterable, optional): The ParallaxLayers. Defaults to none. They are drawn from the
+                lowest depth up.
+        """
+        self.background = background
+        self.layers = sorted(layers, key=lambda layer: layer.depth)
+        color = background.get_at((0, 0))
+        size = background.get_size()
+        solid = pg.mask.from_threshold(background, color, (1, 1, 1, 255)).count() == size[0] * size[1]
+        self.color = color if solid else None
+
+    def update(self):
+        """Drifts every layer by one tick."""
+        for layer in self.layers:
+            layer.update()
+
+    def render(self, surf, offset=(0, 0), track=True):
+        """
+        Draws the background and every layer.
+
+        Args:
+            surf (pygame.Surface): The surface to draw on.
+            offset (tuple): The camera scroll.
+            track (bool, optional): Whether to work out what changed, see ParallaxLayer.render.
+                Defaults to True.
+
+        Returns:
+            list: The areas of the surface the layers changed since the last frame.
+        """
+        if self.color is not None:
+            surf.fill(self.color)
+        else:
+            surf.blit(self.background, (0, 0))
+        changed = []
+        for layer in self.layers:
+            changed += layer.render(surf, offset, track)
+        return changed
@@ -0,0 +1,229 @@
+import pygame as pg
+
+# Window size used unless another one is asked for
+WINDOW_SIZE = (640, 480)
+# How the display is scaled to the window, see Presenter
+SCALE_MODES = ("integer", "smooth", "scaled")
+# Color of the bars around the display when it does not fill the window
+BORDER_COLOR = (0, 0, 0)
+# Width and height in display pixels of the cells changed parts are scaled in, see Presenter.draw
+CELL_SIZE = 16
+
+
+def parse_size(text):
+    """
+    Parses a window size written as WIDTHxHEIGHT, for use as an argparse type.
+
+    Args:
+        text (str): The size, like '1280x960'.
+
+    Returns:
+        tuple: The (width, height) in pixels.
+    """
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+
+def add_window_arguments(parser):
+    """
+    Adds the window options shared by the game and the editor to an argument parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser to add the options to.
+    """
+    parser.add_argument("--window", type=parse_size, default=WINDOW_SIZE, metavar="WxH",
+                        help="window size (default: %dx%d)" % WINDOW_SIZE)
+    parser.add_argument("--scale-mode", choices=SCALE_MODES, default=SCALE_MODES[0],
+                        help="integer: sharp pixels scaled by a whole number, smooth: filtered to fill the window, "
+                             "scaled: let SDL scale the window (default: %(default)s)")
+    parser.add_argument("--fullscreen", action="store_true", help="fill the screen, keeping the aspect ratio")
+    parser.add_argument("--vsync", action="store_true", help="wait for the monitor's refresh when showing a frame")
+
+
+class Presenter:
+    """
+    Opens the window and copies the low resolution display onto it every frame.
+
+    In "integer" mode the display is scaled by the largest whole number that fits the window,
+    keeping pixels square and sharp. In "smooth" mode it is filtered up to fill as much of the
+    window as the aspect ratio allows. In both the picture is centered with bars around it, and
+    it is scaled straight into a subsurface of the window, so no surface is allocated per frame.
+    Changed parts are snapped to cells and scaled in runs of cells along a row, between subsurfaces
+    that are made the first time a run is drawn and kept until the layout changes.
+    In "scaled" mode the window is opened with pygame.SCALED at the display's resolution and SDL
+    does the scaling, which is also the mode where vsync is most likely to be available.
+
+    Attributes:
+        display_size (tuple): The size of the display surface being shown.
+        mode (str): The scale mode, one of SCALE_MODES.
+        screen (pygame.Surface): The window surface.
+        target (pygame.Rect): The area of the window the display is drawn to.
+        dest (pygame.Surface): The subsurface of the window covering `target`.
+        factor (int): The whole number the display is scaled by, or 0 if the scale is fractional.
+        runs (dict): The display subsurface, window subsurface and window rect of every run of cells
+            drawn so far, by (row, first column, last column) of CELL_SIZE cells.
+        vsync (bool): Whether the window was opened with vsync.
+    """
+
+    def __init__(self, display_size, window_size=WINDOW_SIZE, mode="integer", fullscreen=False, vsync=False):
+        """
+        Opens the window.
+
+        Args:
+            display_size (tuple): The size of the display surface that will be shown.
+            window_size (tuple, optional): The window size, ignored in fullscreen and "scaled" mode.
+                Defaults to WINDOW_SIZE.
+            mode (str, optional): The scale mode, one of SCALE_MODES. Defaults to "integer".
+            fullscreen (bool, optional): Whether to fill the screen. Defaults to False.
+            vsync (bool, optional): Whether to ask for vsync. Defaults to False.
+        """
+        if mode not in SCALE_MODES:
+            raise ValueError(f"unknown scale mode {mode!r}, expected one of {', '.join(SCALE_MODES)}")
+        self.display_size = tuple(display_size)
+        self.mode = mode
+        self.vsync = vsync
+
+        flags = pg.FULLSCREEN if fullscreen else 0
+        if mode == "scaled":
+            try:
+                self.screen = self._open(self.display_size, flags | pg.SCALED)
+            except pg.error:  # SCALED needs a renderer, fall back to scaling ourselves
+                self.mode = "integer"
+        if self.mode != "scaled":
+            self.screen = self._open((0, 0) if fullscreen else window_size, flags)  # (0, 0) is the desktop resolution
+        self.layout()
+
+    def _open(self, size, flags):
+        """Opens the window, with vsync if asked for and the renderer can do it."""
+        if self.vsync:
+            try:
+                return pg.display.set_mode(size, flags, vsync=1)
+            except pg.error:  # Not every renderer can do vsync
+                self.vsync = False
+        return pg.display.set_mode(size, flags)
+
+    def layout(self):
+        """Works out where the display goes in the window and clears the bars around it."""
+        sw, sh = self.screen.get_size()
+        dw, dh = self.display_size
+        self.factor = min(sw // dw, sh // dh)
+        if self.mode == "smooth" or not self.factor:
+            ratio = min(sw / dw, sh / dh)
+            size = (int(dw * ratio), int(dh * ratio))
+            self.factor = 0
+        else:
+            size = (dw * self.factor, dh * self.factor)
+        self.target = pg.Rect((0, 0), size)
+        self.target.center = self.screen.get_rect().center
+        self.screen.fill(BORDER_COLOR)
+        self.dest = self.screen.subsurface(self.target)
+        self.runs = {}
+        self.runs_display = None  # The display surface the runs were cut from
+
+    @property
+    def exact(self):
+        """bool: Whether parts of the display can be drawn on their own, which needs a whole number scale."""
+        return self.factor != 0
+
+    def to_display(self, pos):
+        """
+        Converts a window position, like the mouse position, to display coordinates.
+
+        Args:
+            pos (tuple): The (x, y) position in the window.
+
+        Returns:
+            tuple: The (x, y) position on the display.
+        """
+        return ((pos[0] - self.target.x) * self.display_size[0] / self.target.w,
+                (pos[1] - self.target.y) * self.display_size[1] / self.target.h)
+
+    def draw(self, display, rects=None):
+        """
+        Scales the display, or parts of it, onto the window surface.
+
+        Args:
+            display (pygame.Surface): The display surface to show.
+            rects (list, optional): The parts of the display to draw. Only used when `exact`.
+                Defaults to None, the whole display.
+
+        Returns:
+            list: The window rects that were drawn.
+        """
+        if rects is None or not self.exact:
+            if self.factor == 1:
+                self.dest.blit(display, (0, 0))
+            elif self.factor:
+                pg.transform.scale(display, self.target.size, self.dest)
+            else:
+                pg.transform.smoothscale(display, self.target.size, self.dest)
+            return [self.target]
+
+        bounds = display.get_rect()
+        updated = []
+        if self.factor == 1:
+            left, top = self.target.topleft
+            for rect in rects:
+                rect = rect.clip(bounds)
+                if rect:
+                    updated.append(self.screen.blit(display, (left + rect.x, top + rect.y), rect))
+            return updated
+
+        # Scaling needs a surface to scale from and to, so the changed parts are snapped to cells
+        # and drawn in runs along each row, whose subsurfaces are kept to be used again
+        if display is not self.runs_display:
+            self.runs = {}
+            self.runs_display = display
+        rows = {}
+        for rect in rects:
+            rect = rect.clip(bounds)
+            if not rect:
+                continue
+            first, last = rect.left // CELL_SIZE, (rect.right - 1) // CELL_SIZE
+            for cy in range(rect.top // CELL_SIZE, (rect.bottom - 1) // CELL_SIZE + 1):
+                rows.setdefault(cy, []).append((first, last))
+        for cy, spans in rows.items():
+            spans.sort()
+            first, last = spans[0]
+            for span_first, span_last in spans[1:] + [(None, None)]:
+                if span_first is not None and span_first <= last + 1:
+                    last = max(last, span_last)
+                    continue
+                run = self.runs.get((cy, first, last))
+                if run is None:
+                    run = self.runs[(cy, first, last)] = self._run(display, cy, first, last)
+                source, dest, target = run
+                pg.transform.scale(source, target.size, dest)
+                updated.append(target)
+                first, last = span_first, span_last
+        return updated
+
+    def _run(self, display, cy, first, last):
+        """Makes the display subsurface, window subsurface and window rect of a run of cells in a row."""
+        factor = self.factor
+        rect = pg.Rect(first * CELL_SIZE, cy * CELL_SIZE, (last - first + 1) * CELL_SIZE, CELL_SIZE)
+        rect = rect.clip(display.get_rect())
+        target = pg.Rect(self.target.x + rect.x * factor, self.target.y + rect.y * factor,
+                         rect.w * factor, rect.h * factor)
+        return display.subsurface(rect), self.screen.subsurface(target), target
+
+    def show(self, updated):
+        """
+        Shows the drawn parts of the window on screen.
+
+        Args:
+            updated (list): The window rects returned by `draw()`.
+        """
+        if self.mode == "scaled":
+            pg.display.flip()  # SDL redraws the whole scaled window anyway
+        elif updated:
+            pg.display.update(updated)
+
+    def present(self, display):
+        """
+        Draws the whole display onto the window and shows it.
+
+        Args:
+            display (pygame.Surface): The display surface to show.
+        """
+        self.show(self.draw(display))
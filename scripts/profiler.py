@@ -0,0 +1,174 @@
+import csv
+import json
+import time
+from collections import deque
+
+import pygame as pg
+
+# The phases of a frame, in the order Game.run goes through them
+PHASES = ("events", "camera", "clouds", "mobs", "player", "background", "tilemap", "entities",
+          "scale", "overlay", "display", "wait")
+# Number of recent frames the overlay statistics are taken over
+HISTORY = 120
+# The overlay text is redrawn every this many frames instead of every frame
+OVERLAY_REFRESH = 15
+OVERLAY_FONT_SIZE = 18
+OVERLAY_COLOR = (255, 255, 255)
+OVERLAY_BACKGROUND = (0, 0, 0, 160)
+
+
+class FrameProfiler:
+    """
+    Times the phases of every frame, for an on-screen overlay and for frame time traces.
+
+    The game calls `begin_frame()` at the start of a frame, `mark()` at the end of each phase and
+    `end_frame()` when the frame is done. The time since the previous mark is added to the phase
+    named in `mark()`, so phases run several times in one frame (like a tick during catch-up) add
+    up. While the profiler is disabled all three calls return at once.
+
+    Attributes:
+        enabled (bool): Whether frames are being timed.
+        show_overlay (bool): Whether the overlay is drawn.
+        tracing (bool): Whether every frame is kept for `export()`.
+        history (collections.deque): The per-phase times in seconds of the last HISTORY frames.
+        trace (list): Every timed frame since tracing started, as (frame, start, ticks, *phase times, total).
+        frame (int): The number of timed frames.
+        startup (dict): Startup times in seconds by name, like "ready" and "first frame", set by the game.
+    """
+
+    def __init__(self, tracing=False, history=HISTORY):
+        """
+        Initializes the profiler, disabled unless tracing.
+
+        Args:
+            tracing (bool, optional): Whether to keep every frame for `export()`. Defaults to False.
+            history (int, optional): The number of frames the overlay statistics cover. Defaults to HISTORY.
+        """
+        self.tracing = tracing
+        self.show_overlay = False
+        self.enabled = tracing
+        self.history = deque(maxlen=history)
+        self.trace = []
+        self.frame = 0
+        self.startup = {}
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frame_start = self.last = 0.0
+        self.font = None
+        self.overlay = None
+
+    def toggle_overlay(self):
+        """Shows or hides the overlay, timing frames only while it is shown or tracing is on."""
+        self.show_overlay = not self.show_overlay
+        self.enabled = self.show_overlay or self.tracing
+        self.overlay = None
+
+    def begin_frame(self):
+        """Starts timing a new frame."""
+        if not self.enabled:
+            return
+        self.frame_start = self.last = time.perf_counter()
+
+    def mark(self, phase):
+        """
+        Ends a phase, adding the time since the previous mark to it.
+
+        Args:
+            phase (str): The name of the phase, one of PHASES.
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def end_frame(self, ticks=1):
+        """
+        Finishes the current frame and stores its phase times.
+
+        Args:
+            ticks (int, optional): The number of simulation ticks run in the frame. Defaults to 1.
+        """
+        if not self.enabled:
+            return
+        current = self.current
+        times = tuple(current[phase] for phase in PHASES)
+        self.history.append(times)
+        if self.tracing:
+            self.trace.append((self.frame, self.frame_start, ticks) + times + (sum(times),))
+        self.frame += 1
+        for phase in PHASES:
+            current[phase] = 0.0
+
+    def stats(self):
+        """
+        Summarizes the recent frames.
+
+        Returns:
+            dict: The average milliseconds spent in every phase, and the average, 95th percentile
+                and worst total frame time in milliseconds.
+        """
+        frames = len(self.history)
+        if not frames:
+            return {"phases": dict.fromkeys(PHASES, 0.0), "average": 0.0, "p95": 0.0, "worst": 0.0}
+        totals = sorted(sum(times) for times in self.history)
+        phases = {phase: sum(times[i] for times in self.history) * 1000 / frames for i, phase in enumerate(PHASES)}
+        return {"phases": phases, "average": sum(totals) * 1000 / frames,
+                "p95": totals[min(frames - 1, int(frames * 0.95))] * 1000, "worst": totals[-1] * 1000}
+
+    def render(self, surf):
+        """
+        Draws the overlay in the top left corner of a surface, if it is shown.
+
+        Args:
+            surf (pygame.Surface): The surface to draw on.
+        """
+        if not self.show_overlay:
+            return
+        if self.overlay is None or self.frame % OVERLAY_REFRESH == 0:
+            self.overlay = self._draw_overlay()
+        surf.blit(self.overlay, (0, 0))
+
+    def _draw_overlay(self):
+        """Returns a new overlay surface showing the current statistics."""
+        if self.font is None:
+            self.font = pg.font.Font(None, OVERLAY_FONT_SIZE)
+        stats = self.stats()
+        rows = [("frame", stats["average"]), ("p95", stats["p95"]), ("worst", stats["worst"])]
+        rows += [(name, seconds * 1000) for name, seconds in self.startup.items()]
+        rows += list(stats["phases"].items())
+        labels = [self.font.render(label, True, OVERLAY_COLOR) for label, _ in rows]
+        values = [self.font.render(f"{ms:.2f} ms", True, OVERLAY_COLOR) for _, ms in rows]
+
+        # Two columns, with the times right-aligned since the default font is not monospaced
+        label_width = max(text.get_width() for text in labels) + 8
+        value_width = max(text.get_width() for text in values)
+        line_height = self.font.get_linesize()
+        overlay = pg.Surface((label_width + value_width + 8, line_height * len(rows) + 8), pg.SRCALPHA)
+        overlay.fill(OVERLAY_BACKGROUND)
+        for i, (label, value) in enumerate(zip(labels, values)):
+            y = 4 + i * line_height
+            overlay.blit(label, (4, y))
+            overlay.blit(value, (4 + label_width + value_width - value.get_width(), y))
+        return overlay
+
+    def export(self, path):
+        """
+        Writes the trace to a file, as JSON if the path ends in .json and as CSV otherwise.
+
+        Times are in milliseconds, and the frame start in seconds of time.perf_counter(). JSON
+        traces also hold the startup times.
+
+        Args:
+            path (str): The file to write.
+        """
+        columns = ["frame", "start", "ticks"] + list(PHASES) + ["total"]
+        rows = [row[:3] + tuple(seconds * 1000 for seconds in row[3:]) for row in self.trace]
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({"columns": columns, "frames": rows,
+                           "startup": {name: seconds * 1000 for name, seconds in self.startup.items()}}, f)
+        else:
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows(rows)
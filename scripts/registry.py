@@ -0,0 +1,126 @@
+import itertools
+
+
+class EntityRegistry:
+    """
+    Keeps track of every spawned entity by id, by group and by type.
+
+    Ids are handed out from a counter, so they never clash and spawning never has to scan other
+    entities. Spawns and despawns only reach the group and type indexes when `flush()` is called
+    at the end of a tick, so the groups can be iterated safely while entities are updated.
+    A despawned entity is marked dead and dropped from its group's spatial hash right away.
+
+    Attributes:
+        entities (dict): Every live or pending entity by id.
+        groups (dict): The entities of every group, as {group name: {id: entity}}.
+        types (dict): The entities of every entity type, as {type: {id: entity}}.
+        spatial (dict): The SpatialHash kept in sync with each group that has one.
+        pending_spawns (list): Entities spawned since the last flush.
+        pending_despawns (list): Entities despawned since the last flush.
+    """
+
+    def __init__(self):
+        """Initializes an empty registry."""
+        self.entities = {}
+        self.groups = {}
+        self.types = {}
+        self.spatial = {}
+        self.pending_spawns = []
+        self.pending_despawns = []
+        self._ids = itertools.count(1)
+
+    def add_group(self, name, spatial=None):
+        """
+        Creates an entity group.
+
+        Args:
+            name (str): The name of the group.
+            spatial (SpatialHash, optional): A spatial hash to add the group's entities to on flush
+                and remove them from on despawn.
+
+        Returns:
+            dict_values: A live view of the entities in the group.
+        """
+        self.groups[name] = {}
+        if spatial is not None:
+            self.spatial[name] = spatial
+        return self.groups[name].values()
+
+    def spawn(self, entity, group):
+        """
+        Registers a new entity, giving it an id. It joins its group on the next flush.
+
+        Args:
+            entity (PhysicsEntity): The entity to register.
+            group (str): The name of the group the entity belongs to.
+
+        Returns:
+            int: The id given to the entity.
+        """
+        entity.id = next(self._ids)
+        entity.group = group
+        entity.alive = True
+        self.entities[entity.id] = entity
+        self.pending_spawns.append(entity)
+        return entity.id
+
+    def despawn(self, entity):
+        """
+        Marks an entity as dead. It leaves its group and type index on the next flush.
+
+        Args:
+            entity (PhysicsEntity): The entity to remove.
+
+        Returns:
+            bool: True if the entity was alive, False if it had already been despawned.
+        """
+        if not entity.alive:
+            return False
+        entity.alive = False
+        self.pending_despawns.append(entity)
+        spatial = self.spatial.get(entity.group)
+        if spatial is not None:
+            spatial.remove(entity)
+        return True
+
+    def get(self, entity_id):
+        """
+        Looks up an entity by id.
+
+        Args:
+            entity_id (int): The id of the entity.
+
+        Returns:
+            PhysicsEntity: The entity, or None if there is no entity with that id.
+        """
+        return self.entities.get(entity_id)
+
+    def of_type(self, e_type):
+        """
+        Returns the live entities of one type, as of the last flush.
+
+        Args:
+            e_type (str): The entity type, like 'goomba'.
+
+        Returns:
+            dict_values: A live view of the entities of that type.
+        """
+        return self.types.setdefault(e_type, {}).values()
+
+    def flush(self):
+        """Applies the spawns and despawns made since the last flush."""
+        for entity in self.pending_despawns:
+            del self.entities[entity.id]
+            self.groups[entity.group].pop(entity.id, None)
+            self.types.get(entity.type, {}).pop(entity.id, None)
+        self.pending_despawns.clear()
+
+        for entity in self.pending_spawns:
+            if not entity.alive:
+                continue  # Despawned before it ever joined its group
+            self.groups[entity.group][entity.id] = entity
+            self.types.setdefault(entity.type, {})[entity.id] = entity
+            spatial = self.spatial.get(entity.group)
+            if spatial is not None:
+                spatial.update(entity)
+        self.pending_spawns.clear()
@@ -0,0 +1,103 @@
+import pygame as pg
+
+BASE_SOUND_PATH = "sounds/"  # Path to folder containing all sound effects
+
+# Sound effects loaded by the SoundBank, as name: (file, how many copies may play at once)
+SOUNDS = {
+    "jump": ("jump.ogg", 2),
+    "kick": ("kick.wav", 2),
+    "powerup": ("powerup.ogg", 1),
+    "gameover": ("gameover.ogg", 1),
+}
+# Number of mixer channels reserved for sound effects
+CHANNEL_COUNT = 8
+
+
+class SoundBank:
+    """
+    Decodes every sound effect once and plays them through a fixed pool of mixer channels.
+
+    Each sound has a limit on how many copies may play at the same time. Requests over the limit,
+    or made while every channel is busy, are dropped instead of queued.
+
+    Attributes:
+        sounds (dict): The decoded pygame.mixer.Sound for every sound name.
+        limits (dict): The maximum number of simultaneous copies for every sound name.
+        channels (list): The pygame.mixer.Channel objects sound effects are played on.
+        decodes (int): Sound files decoded during the current frame.
+        plays (int): Sounds started during the current frame.
+        dropped (int): Sounds skipped during the current frame because of the limits.
+        last_frame (dict): The decodes, plays and dropped counts of the last finished frame.
+        totals (dict): The decodes, plays and dropped counts since the bank was created.
+    """
+
+    def __init__(self, sounds=SOUNDS, channel_count=CHANNEL_COUNT):
+        """
+        Initializes the sound bank, decoding all sounds if the mixer is available.
+
+        Args:
+            sounds (dict, optional): Sounds to load, as name: (file, limit). Defaults to SOUNDS.
+            channel_count (int, optional): The number of channels in the pool. Defaults to CHANNEL_COUNT.
+        """
+        self.sounds = {}
+        self.limits = {}
+        self.channels = []
+        self.decodes = self.plays = self.dropped = 0
+        self.last_frame = {"decodes": 0, "plays": 0, "dropped": 0}
+        self.totals = {"decodes": 0, "plays": 0, "dropped": 0}
+
+        # Without a mixer (for example with no audio device) the bank stays silent
+        if not pg.mixer.get_init():
+            return
+
+        if pg.mixer.get_num_channels() < channel_count:
+            pg.mixer.set_num_channels(channel_count)
+        self.channels = [pg.mixer.Channel(i) for i in range(channel_count)]
+
+        for name, (file, limit) in sounds.items():
+            self.sounds[name] = pg.mixer.Sound(BASE_SOUND_PATH + file)
+            self.limits[name] = limit
+            self.decodes += 1
+
+    def play(self, name):
+        """
+        Plays a sound effect on a free channel, unless it would exceed the sound's limit.
+
+        Args:
+            name (str): The name of the sound to play.
+
+        Returns:
+            bool: True if the sound was started.
+        """
+        sound = self.sounds.get(name)
+        if sound is None:
+            return False
+
+        free = None
+        playing = 0
+        for channel in self.channels:
+            if not channel.get_busy():
+                if free is None:
+                    free = channel
+            elif channel.get_sound() is sound:
+                playing += 1
+
+        if free is None or playing >= self.limits[name]:
+            self.dropped += 1
+            return False
+        free.play(sound)
+        self.plays += 1
+        return True
+
+    def end_frame(self):
+        """
+        Closes the current frame's counters, storing them in `last_frame` and adding them to `totals`.
+
+        Returns:
+            dict: The decodes, plays and dropped counts of the frame that just ended.
+        """
+        self.last_frame = {"decodes": self.decodes, "plays": self.plays, "dropped": self.dropped}
+        for key, count in self.last_frame.items():
+            self.totals[key] += count
+        self.decodes = self.plays = self.dropped = 0
+        return self.last_frame
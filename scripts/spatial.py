@@ -0,0 +1,113 @@
+# Width and height in pixels of the spatial hash cells, about two tiles so most mobs touch one to four cells
+CELL_SIZE = 32
+
+
+class SpatialHash:
+    """
+    A uniform grid that buckets entities by the cells their rects overlap, for fast nearby-entity queries.
+
+    Entities are added and moved with `update()` and dropped with `remove()`. Moving an entity only
+    touches the hash when it crosses into a different set of cells.
+
+    Attributes:
+        cell_size (int): The width and height of a cell in pixels.
+        cells (dict): The entities in every non-empty cell, keyed by (x, y) cell position.
+        entity_cells (dict): The (left, top, right, bottom) cell range every entity is stored in.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE):
+        """
+        Initializes an empty spatial hash.
+
+        Args:
+            cell_size (int, optional): The width and height of a cell in pixels. Defaults to CELL_SIZE.
+        """
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entity_cells = {}
+
+    def __contains__(self, entity):
+        return entity in self.entity_cells
+
+    def __len__(self):
+        return len(self.entity_cells)
+
+    def _cell_range(self, rect, margin=0):
+        """Returns the (left, top, right, bottom) range of cells a rect grown by `margin` pixels overlaps."""
+        size = self.cell_size
+        return ((rect[0] - margin) // size, (rect[1] - margin) // size,
+                (rect[0] + rect[2] + margin - 1) // size, (rect[1] + rect[3] + margin - 1) // size)
+
+    def update(self, entity):
+        """
+        Adds an entity, or moves it to the cells its current rect overlaps.
+
+        Args:
+            entity (PhysicsEntity): The entity to store.
+        """
+        new = self._cell_range(entity.rect())
+        old = self.entity_cells.get(entity)
+        if old == new:
+            return
+        if old is not None:
+            self._unlink(entity, old)
+        self.entity_cells[entity] = new
+        for x in range(new[0], new[2] + 1):
+            for y in range(new[1], new[3] + 1):
+                cell = self.cells.get((x, y))
+                if cell is None:
+                    cell = self.cells[(x, y)] = {}
+                cell[entity] = None
+
+    def remove(self, entity):
+        """
+        Removes an entity from the hash, if it is in it.
+
+        Args:
+            entity (PhysicsEntity): The entity to remove.
+        """
+        old = self.entity_cells.pop(entity, None)
+        if old is not None:
+            self._unlink(entity, old)
+
+    def _unlink(self, entity, cell_range):
+        """Removes an entity from every cell in a cell range, dropping cells that become empty."""
+        for x in range(cell_range[0], cell_range[2] + 1):
+            for y in range(cell_range[1], cell_range[3] + 1):
+                cell = self.cells[(x, y)]
+                del cell[entity]
+                if not cell:
+                    del self.cells[(x, y)]
+
+    def query(self, rect, margin=0):
+        """
+        Finds the entities stored in the cells around a rect.
+
+        The result is a superset of the entities overlapping the rect, so callers still do an exact
+        collision test on each candidate.
+
+        Args:
+            rect (pygame.Rect): The area to search.
+            margin (int, optional): Extra pixels to search around the rect, to cover entities that
+                have moved since they were last updated in the hash. Defaults to 0.
+
+        Returns:
+            list: The candidate entities, each listed once.
+        """
+        left, top, right, bottom = self._cell_range(rect, margin)
+        if left == right and top == bottom:
+            return list(self.cells.get((left, top), ()))
+
+        found = {}
+        if (right - left + 1) * (bottom - top + 1) > len(self.cells):
+            # Large areas over a sparse hash are cheaper to search by walking the occupied cells
+            for (x, y), cell in self.cells.items():
+                if left <= x <= right and top <= y <= bottom:
+                    found.update(cell)
+        else:
+            for x in range(left, right + 1):
+                for y in range(top, bottom + 1):
+                    cell = self.cells.get((x, y))
+                    if cell:
+                        found.update(cell)
+        return list(found)
@@ -0,0 +1,189 @@
+import mmap
+import os
+import queue
+import threading
+
+from scripts.tilemap import read_binary_header, BINARY_MAP_OFFGRID
+
+# Width in tile columns of the chunks a streamed level is read in
+STREAM_CHUNK_COLUMNS = 64
+
+
+class LevelStream:
+    """
+    Reads the grid of a binary map in chunks of whole columns, ahead of time on a background thread.
+
+    Binary maps store the grid column by column, so every chunk is one contiguous byte range of
+    the file. Chunks are asked for with `request()`, read by the worker thread into `ready`, and
+    handed over with `take()`, which reads the chunk right away if the worker has not got to it
+    yet. Only the header, type table and offgrid tiles are kept in memory for the whole level.
+
+    Attributes:
+        path (str): The path of the map file.
+        tile_size (int): The size of each tile in pixels.
+        grid_x (int): The tile x coordinate of the first grid column in the file.
+        grid_y (int): The tile y coordinate of the first grid row.
+        grid_w (int): The number of columns in the file.
+        grid_h (int): The number of rows in the file.
+        type_names (list): The tile type names indexed by the file's type ids, None for id 0.
+        offgrid (bytes): The packed BINARY_MAP_OFFGRID records of the offgrid tiles.
+        chunk_columns (int): The number of columns in every chunk but possibly the last.
+        chunk_count (int): The number of chunks in the level.
+        ready (dict): Chunks read by the worker and not taken yet, by chunk index.
+    """
+
+    def __init__(self, path, chunk_columns=STREAM_CHUNK_COLUMNS):
+        """
+        Opens a binary map for streaming and starts the worker thread.
+
+        Args:
+            path (str): The path of the binary map.
+            chunk_columns (int, optional): The width of a chunk in columns. Defaults to STREAM_CHUNK_COLUMNS.
+        """
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        header, self.type_names, self.grid_offset = read_binary_header(self.data, path)
+        self.tile_size = header["tile_size"]
+        self.grid_x, self.grid_y = header["grid_x"], header["grid_y"]
+        self.grid_w, self.grid_h = header["grid_w"], header["grid_h"]
+        offgrid_start = self.grid_offset + self.grid_w * self.grid_h
+        self.offgrid = self.data[offgrid_start:offgrid_start + header["offgrid_count"] * BINARY_MAP_OFFGRID.size]
+
+        self.chunk_columns = chunk_columns
+        self.chunk_count = -(-self.grid_w // chunk_columns)
+        self.ready = {}
+        self.queued = set()
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self._work, name=f"stream {path}", daemon=True)
+        self.worker.start()
+
+    def chunk_columns_of(self, index):
+        """
+        Returns the range of columns a chunk covers.
+
+        Args:
+            index (int): The chunk index.
+
+        Returns:
+            tuple: The tile x coordinate of the chunk's first column and its number of columns.
+        """
+        first = index * self.chunk_columns
+        return self.grid_x + first, min(self.chunk_columns, self.grid_w - first)
+
+    def chunk_at(self, x):
+        """
+        Returns the index of the chunk holding a tile column, clamped to the level.
+
+        Args:
+            x (int): The tile x coordinate.
+
+        Returns:
+            int: The chunk index.
+        """
+        return min(max((x - self.grid_x) // self.chunk_columns, 0), self.chunk_count - 1)
+
+    def cell(self, x, y):
+        """
+        Reads the file type id of one cell straight from the mapped file.
+
+        Args:
+            x (int): The tile x coordinate.
+            y (int): The tile y coordinate.
+
+        Returns:
+            int: The type id as saved, 0 outside the level.
+        """
+        cx, cy = x - self.grid_x, y - self.grid_y
+        if 0 <= cx < self.grid_w and 0 <= cy < self.grid_h:
+            return self.data[self.grid_offset + cx * self.grid_h + cy]
+        return 0
+
+    def _read(self, index):
+        """Reads the grid bytes of a chunk from the file."""
+        first = index * self.chunk_columns
+        columns = min(self.chunk_columns, self.grid_w - first)
+        # pread releases the GIL and leaves the file position alone, so both threads can use it
+        return os.pread(self.file.fileno(), columns * self.grid_h, self.grid_offset + first * self.grid_h)
+
+    def _work(self):
+        """Reads requested chunks until None is requested."""
+        while True:
+            index = self.requests.get()
+            if index is None:
+                return
+            chunk = self._read(index)
+            with self.lock:
+                if index in self.queued:
+                    self.ready[index] = chunk
+
+    def request(self, index):
+        """
+        Asks the worker thread to read a chunk, unless it is already read or on its way.
+
+        Args:
+            index (int): The chunk index, ignored if outside the level.
+        """
+        with self.lock:
+            if not 0 <= index < self.chunk_count or index in self.queued:
+                return
+            self.queued.add(index)
+        self.requests.put(index)
+
+    def take(self, index):
+        """
+        Returns the grid bytes of a chunk, reading them now if the worker has not yet.
+
+        Args:
+            index (int): The chunk index.
+
+        Returns:
+            bytes: The file type id of every cell in the chunk, column by column.
+        """
+        with self.lock:
+            self.queued.discard(index)
+            chunk = self.ready.pop(index, None)
+        if chunk is None:
+            chunk = self._read(index)
+        return chunk
+
+    def discard(self, first, last):
+        """
+        Forgets read-ahead chunks outside a range of chunk indexes, keeping memory use bounded.
+
+        Args:
+            first (int): The first chunk index to keep.
+            last (int): The last chunk index to keep.
+        """
+        with self.lock:
+            for index in [index for index in self.queued if not first <= index <= last]:
+                self.queued.discard(index)
+                self.ready.pop(index, None)
+
+    def find(self, file_id):
+        """
+        Finds every cell holding a type id by searching the memory-mapped file.
+
+        Args:
+            file_id (int): The type id in the file.
+
+        Returns:
+            list: The (x, y) grid position of each cell, in column order.
+        """
+        found = []
+        start, end = self.grid_offset, self.grid_offset + self.grid_w * self.grid_h
+        needle = bytes((file_id,))
+        i = self.data.find(needle, start, end)
+        while i != -1:
+            cell = i - start
+            found.append((self.grid_x + cell // self.grid_h, self.grid_y + cell % self.grid_h))
+            i = self.data.find(needle, i + 1, end)
+        return found
+
+    def close(self):
+        """Stops the worker thread and closes the file."""
+        self.requests.put(None)
+        self.worker.join()
+        self.data.close()
+        self.file.close()
@@ -1,41 +1,614 @@
 import pygame as pg
 import json
+import mmap
+import os
+import struct
+import sys
+from collections import OrderedDict
+from collections.abc import MutableMapping
 
 # Defines the offsets to check surrounding tiles for interactions
 NEIGHBOR_OFFSET = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 0),
                    (0, 1), (1, -1), (1, 0), (1, 1), (-1, 2), (0, 2), (1, 2)]
 # Identifies which tiles interact with physics, affecting entities like the player and mobs
 PHYSICS_TILES = {"brick", "ground", "random", "random2"}
+# Tiles that only mark spawn points for entities and are never drawn as tiles
+ENTITY_TILES = {"goomba", "koopa"}
+# Tile type id used for empty grid cells
+EMPTY = 0
+# Extra cells added on each side when the grid has to grow, so painting near an edge does not reallocate every frame
+GRID_MARGIN = 16
+# Width and height, in tiles, of the pre-rendered chunk surfaces used by Tilemap.render
+CHUNK_SIZE = 16
+# Maximum number of baked chunk surfaces kept around, least recently drawn ones are dropped first
+CHUNK_CACHE_SIZE = 32
+# Fill color marking the transparent parts of a baked chunk
+CHUNK_COLORKEY = (255, 0, 255)
+# Width and height in pixels of the buckets offgrid tiles are indexed in, see Tilemap.offgrid_in
+OFFGRID_BUCKET_SIZE = 128
+
+# How many chunks past each side of a streamed window are read ahead, see Tilemap.update_stream
+STREAM_PREFETCH = 2
+
+# Binary map format, see Tilemap.save_binary
+BINARY_MAP_EXTENSION = ".bmap"
+BINARY_MAP_MAGIC = b"MARIOMAP"
+BINARY_MAP_VERSION = 1
+# magic, format version, tile size, grid x, grid y, grid width, grid height, type count, offgrid count
+BINARY_MAP_HEADER = struct.Struct("<8sHHiiIIHI")
+# type id, x, y
+BINARY_MAP_OFFGRID = struct.Struct("<Bff")
+
+
+def parse_loc(loc):
+    """
+    Converts an 'x;y' tile key from the JSON map format into an integer grid position.
+
+    Args:
+        loc (str): The tile key in 'x;y' format.
+
+    Returns:
+        tuple: The (x, y) grid position.
+    """
+    x, y = loc.split(";")
+    return (int(x), int(y))
+
+
+def read_binary_header(data, path):
+    """
+    Reads the header and type table at the start of a binary map.
+
+    Args:
+        data (bytes-like): The map file contents, or a memory mapping of them.
+        path (str): The map's path, used in the error message.
+
+    Returns:
+        tuple: The header fields as a dictionary, the type names indexed by type id (None for id 0),
+            and the offset where the grid starts.
+    """
+    (magic, version, tile_size, grid_x, grid_y, grid_w, grid_h,
+     type_count, offgrid_count) = BINARY_MAP_HEADER.unpack_from(data)
+    if magic != BINARY_MAP_MAGIC or version != BINARY_MAP_VERSION:
+        raise ValueError(f"{path} is not a version {BINARY_MAP_VERSION} binary map")
+
+    offset = BINARY_MAP_HEADER.size
+    names = [None]
+    for _ in range(type_count):
+        length = data[offset]
+        names.append(sys.intern(bytes(data[offset + 1:offset + 1 + length]).decode()))
+        offset += 1 + length
+    header = {"tile_size": tile_size, "grid_x": grid_x, "grid_y": grid_y, "grid_w": grid_w,
+              "grid_h": grid_h, "offgrid_count": offgrid_count}
+    return header, names, offset
+
+
+def write_map(snapshot, path, binary=None):
+    """
+    Writes a tilemap snapshot to a map file, replacing the file in one step.
+
+    The map is written to a temporary file next to it, flushed to disk and then renamed over the
+    old file, so a crash while saving leaves either the old map or the new one, never half of one.
+
+    Args:
+        snapshot (dict): The map, as returned by `Tilemap.snapshot()`.
+        path (str): The file path where the map should be saved.
+        binary (bool, optional): Whether to use the binary format. Defaults to None, which picks it
+            for paths ending in BINARY_MAP_EXTENSION and JSON for anything else.
+    """
+    if binary is None:
+        binary = path.endswith(BINARY_MAP_EXTENSION)
+    names, h = snapshot["type_names"], snapshot["grid_h"]
+    if binary:
+        parts = [BINARY_MAP_HEADER.pack(BINARY_MAP_MAGIC, BINARY_MAP_VERSION, snapshot["tile_size"],
+                                        snapshot["grid_x"], snapshot["grid_y"], snapshot["grid_w"], h,
+                                        len(names) - 1, len(snapshot["offgrid"]))]
+        for name in names[1:]:
+            encoded = name.encode()
+            parts.append(bytes((len(encoded),)) + encoded)
+        parts.append(snapshot["grid"])
+        parts.extend(BINARY_MAP_OFFGRID.pack(*record) for record in snapshot["offgrid"])
+        data = b"".join(parts)
+    else:
+        tiles = {}
+        for i, tid in enumerate(snapshot["grid"]):
+            if tid:
+                x, y = snapshot["grid_x"] + i // h, snapshot["grid_y"] + i % h
+                tiles[str(x) + ";" + str(y)] = {"type": names[tid], "pos": [x, y]}
+        offgrid = [{"type": names[tid], "pos": [x, y]} for tid, x, y in snapshot["offgrid"]]
+        data = json.dumps({"tilemap": tiles, "tilesize": snapshot["tile_size"], "offgrid": offgrid}).encode()
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+class TileView(MutableMapping):
+    """
+    A live, dict-like view of one grid tile with the old {"type", "pos"} layout.
+
+    Writing "type" changes the tile in the grid, so code that mutates tiles it got from `Tilemap.tilemap` keeps working.
+    """
+    __slots__ = ("tilemap", "pos")
+
+    def __init__(self, tilemap, pos):
+        self.tilemap = tilemap
+        self.pos = pos
+
+    def __getitem__(self, key):
+        if key == "type":
+            return self.tilemap.get_tile(self.pos)
+        if key == "pos":
+            return list(self.pos)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key != "type":
+            raise KeyError(key)
+        self.tilemap.set_tile(self.pos, value)
+
+    def __delitem__(self, key):
+        raise TypeError("grid tiles always have a type and a position")
+
+    def __iter__(self):
+        return iter(("type", "pos"))
+
+    def __len__(self):
+        return 2
+
+
+class TilemapView(MutableMapping):
+    """
+    Compatibility view exposing the tile grid as the old {"x;y": {"type", "pos"}} dictionary.
+
+    Lookups parse the key, so this is meant for tools and one-off edits, not for per-frame code.
+    """
+    __slots__ = ("tilemap",)
+
+    def __init__(self, tilemap):
+        self.tilemap = tilemap
+
+    def __getitem__(self, loc):
+        pos = parse_loc(loc)
+        if self.tilemap.get_tile(pos) is None:
+            raise KeyError(loc)
+        return TileView(self.tilemap, pos)
+
+    def __setitem__(self, loc, tile):
+        self.tilemap.set_tile(parse_loc(loc), tile["type"])
+
+    def __delitem__(self, loc):
+        if not self.tilemap.remove_tile(parse_loc(loc)):
+            raise KeyError(loc)
+
+    def __contains__(self, loc):
+        return self.tilemap.get_tile(parse_loc(loc)) is not None
+
+    def __iter__(self):
+        for pos, _ in self.tilemap.iter_tiles():
+            yield str(pos[0]) + ";" + str(pos[1])
+
+    def __len__(self):
+        return self.tilemap.tile_count
 
 
 class Tilemap:
     """
     Represents the tilemap for a game, handling loading, saving, and rendering of tiles.
 
+    Grid tiles are stored as one byte per cell in a column-major bytearray that grows as tiles are placed.
+    Each byte is an id into `type_names`, with 0 meaning an empty cell.
+
     Attributes:
         tile_size (int): The size of each tile in pixels.
-        tilemap (dict): A dictionary representing the tile layout with positions as keys.
         game (Game): The game instance this tilemap belongs to.
-        offgrid_tiles (list): A list of tiles that are placed outside the regular grid.
+        offgrid_tiles (list): A list of tiles that are placed outside the regular grid, in draw order.
+            Changed with `add_offgrid()` and `remove_offgrid()` so the bucket index stays in sync.
+        offgrid_buckets (dict): The offgrid tiles bucketed by position, see `offgrid_in()`.
         randoms (list): Positions of 'random' tiles that can trigger special interactions.
         initial_render (bool): Indicates whether the tilemap has been initially rendered.
+        type_names (list): Interned tile type names indexed by type id.
+        type_ids (dict): Maps tile type names to their type id.
+        grid (bytearray): The tile type id of every cell inside the grid bounds.
+        grid_x (int): The tile x coordinate of the first grid column.
+        grid_y (int): The tile y coordinate of the first grid row.
+        grid_w (int): The number of columns in the grid.
+        grid_h (int): The number of rows in the grid.
+        tile_count (int): The number of non-empty grid cells.
+        solid_cells (bytearray): 1 for every grid cell holding a physics tile and 0 elsewhere, laid out like `grid`.
+        cell_rects (dict): The collision rect of every solid cell queried so far, keyed by grid index.
+        version (int): Counter increased on every change to the grid, for caches built from it.
+        listeners (list): The functions called on every single tile change, see `subscribe()`.
+        level (LevelStream): The level the grid is streamed from, or None if the whole map is loaded.
+        chunks (OrderedDict): Baked chunk surfaces keyed by chunk position, in least recently drawn order.
     """
     def __init__(self, game, tile_size=16) -> None:
         """
         Initializes a new Tilemap object with a reference to the game instance and a specified tile size.
-        
+
         Args:
             game (Game): The game instance the tilemap belongs to.
             tile_size (int, optional): The size of each tile in pixels. Defaults to 16.
         """
         # Set up the tilemap with a reference to the game instance and default tile size
         self.tile_size = tile_size
-        self.tilemap = {}
         self.game = game
         self.offgrid_tiles = []
+        self.offgrid_buckets = {}  # (order, tile) pairs by the bucket of the tile's top left corner
+        self.offgrid_order = 0  # Draw order of the next offgrid tile added
+        self.offgrid_sizes = {}  # Image (width, height) of every offgrid tile type, None until looked up
+        self.offgrid_reach = (0, 0)  # The largest offgrid image size
         self.randoms = []  # Tracks positions for random interactions or items
         self.initial_render = True  # Indicates if the map has been initially rendered
 
+        # Type id tables, id 0 is reserved for empty cells
+        self.type_names = [None]
+        self.type_ids = {}
+        self.solid = bytearray(1)  # 1 for type ids listed in PHYSICS_TILES
+        self.hidden = bytearray(1)  # 1 for type ids listed in ENTITY_TILES
+
+        self.grid = bytearray()
+        self.grid_x = 0
+        self.grid_y = 0
+        self.grid_w = 0
+        self.grid_h = 0
+        self.tile_count = 0
+
+        # Collision lookup, see physics_rects_around()
+        self.solid_cells = bytearray()  # 1 for every grid cell holding a physics tile, laid out like the grid
+        self.cell_rects = {}  # The collision rect of every solid cell queried so far, by grid index
+        self.neighbor_deltas = []  # (grid index delta, x offset, y offset) for every NEIGHBOR_OFFSET
+        self.physics_rects = []  # Returned by physics_rects_around(), reused between calls
+        self.version = 0
+        self.listeners = []  # Told about every single tile change, see subscribe()
+        self._view = TilemapView(self)
+
+        # Streaming state, see stream()
+        self.level = None
+        self.window = (0, -1)  # First and last chunk index in the grid
+        self.stream_table = None
+        self.stream_edits = {}  # Tile changes by chunk index, as {chunk index: {(x, y): type id}}
+
+        # Render cache, see render()
+        self.chunks = OrderedDict()
+        self.images = []  # Tile image for every type id, None if it has no image
+        self.extents = []  # Extra (columns, rows) every type id's image covers past its own cell
+        self.overhang = (0, 0)  # The largest extents of any tile image
+
+    @property
+    def tilemap(self):
+        """TilemapView: The grid seen as the old {"x;y": {"type", "pos"}} dictionary."""
+        return self._view
+
+    def type_id(self, tile_type):
+        """
+        Returns the type id for a tile type, registering the type if it has not been seen before.
+
+        Args:
+            tile_type (str): The tile type name.
+
+        Returns:
+            int: The type id used in the grid.
+        """
+        tid = self.type_ids.get(tile_type)
+        if tid is None:
+            tid = len(self.type_names)
+            if tid > 255:
+                raise ValueError("Tilemap supports at most 255 tile types")
+            tile_type = sys.intern(tile_type)
+            self.type_names.append(tile_type)
+            self.type_ids[tile_type] = tid
+            self.solid.append(tile_type in PHYSICS_TILES)
+            self.hidden.append(tile_type in ENTITY_TILES)
+        return tid
+
+    def get_tile(self, pos):
+        """
+        Returns the type of the tile at a grid position.
+
+        Args:
+            pos (tuple): The (x, y) grid position.
+
+        Returns:
+            str: The tile type, or None if the cell is empty.
+        """
+        x = pos[0] - self.grid_x
+        y = pos[1] - self.grid_y
+        if 0 <= x < self.grid_w and 0 <= y < self.grid_h:
+            return self.type_names[self.grid[x * self.grid_h + y]]
+        return None
+
+    def set_tile(self, pos, tile_type):
+        """
+        Places a tile at a grid position, replacing any tile already there.
+
+        Args:
+            pos (tuple): The (x, y) grid position.
+            tile_type (str): The tile type to place.
+        """
+        tid = self.type_id(tile_type)
+        x, y = int(pos[0]), int(pos[1])
+        inside = 0 <= x - self.grid_x < self.grid_w and 0 <= y - self.grid_y < self.grid_h
+        if self.level is not None:
+            self._record_edit(x, y, tid)
+            if not inside:
+                return  # Applied when the column is streamed in
+        elif not inside:
+            self._grow(x, y, x, y)
+        i = (x - self.grid_x) * self.grid_h + (y - self.grid_y)
+        old = self.grid[i]
+        if old == tid:
+            return
+        if old == EMPTY:
+            self.tile_count += 1
+        self._change_tile(i, x, y, old, tid)
+
+    def remove_tile(self, pos):
+        """
+        Removes the tile at a grid position.
+
+        On a streamed map, a tile outside the streamed window is removed when its column is streamed in.
+
+        Args:
+            pos (tuple): The (x, y) grid position.
+
+        Returns:
+            bool: True if a tile was removed, False if the cell was already empty.
+        """
+        x, y = int(pos[0]), int(pos[1])
+        if 0 <= x - self.grid_x < self.grid_w and 0 <= y - self.grid_y < self.grid_h:
+            i = (x - self.grid_x) * self.grid_h + (y - self.grid_y)
+            old = self.grid[i]
+            if old != EMPTY:
+                if self.level is not None:
+                    self._record_edit(x, y, EMPTY)
+                self.tile_count -= 1
+                self._change_tile(i, x, y, old, EMPTY)
+                return True
+        elif self.level is not None and self._streamed_tile(x, y) != EMPTY:
+            self._record_edit(x, y, EMPTY)  # Applied when the column is streamed in
+            return True
+        return False
+
+    def set_tiles(self, tiles):
+        """
+        Changes many grid tiles in one go, like a fill or a paste.
+
+        The grid grows at most once, `version` goes up once and the baked chunks under the changed
+        area are dropped once, so each tile costs little more than writing its byte. Listeners are
+        still told about every tile that changed.
+
+        Args:
+            tiles (dict): The new tile type, or None to empty the cell, by (x, y) grid position.
+
+        Returns:
+            dict: The (old type, new type) of every tile that changed, by grid position.
+        """
+        if self.level is not None:  # Streamed edits are recorded per chunk, see set_tile()
+            changed = {}
+            for pos, tile_type in tiles.items():
+                old = self.get_tile(pos)
+                if tile_type is None:
+                    self.remove_tile(pos)
+                else:
+                    self.set_tile(pos, tile_type)
+                if old != tile_type:
+                    changed[pos] = (old, tile_type)
+            return changed
+
+        ids = {tile_type: self.type_id(tile_type) for tile_type in set(tiles.values()) if tile_type is not None}
+        ids[None] = EMPTY
+        placed = [pos for pos, tile_type in tiles.items() if tile_type is not None]
+        if placed:
+            xs, ys = zip(*placed)
+            left, top, right, bottom = min(xs), min(ys), max(xs), max(ys)
+            if not (self.grid_x <= left and right < self.grid_x + self.grid_w
+                    and self.grid_y <= top and bottom < self.grid_y + self.grid_h):
+                self._grow(left, top, right, bottom)
+
+        grid, solid_cells, solid, names = self.grid, self.solid_cells, self.solid, self.type_names
+        grid_x, grid_y, w, h = self.grid_x, self.grid_y, self.grid_w, self.grid_h
+        changed, count = {}, 0
+        for (x, y), tile_type in tiles.items():
+            cx, cy = x - grid_x, y - grid_y
+            if not (0 <= cx < w and 0 <= cy < h):
+                continue  # Only empty cells are outside the grid
+            i = cx * h + cy
+            old, tid = grid[i], ids[tile_type]
+            if old != tid:
+                grid[i] = tid
+                solid_cells[i] = solid[tid]
+                count += (tid != EMPTY) - (old != EMPTY)
+                changed[(x, y)] = (names[old], tile_type)
+        if not changed:
+            return {}
+
+        self.tile_count += count
+        self.version += 1
+        # One pass over the chunks under the changed area, as far as the largest image of any type reaches
+        xs, ys = zip(*changed)
+        self._invalidate(min(xs), min(ys), max(xs), max(ys), range(len(names)))
+        for listener in self.listeners:
+            for pos, (old, new) in changed.items():
+                listener(pos, old, new)
+        return changed
+
+    def region(self, left, top, right, bottom):
+        """
+        Copies the grid tiles inside inclusive tile bounds, reading each column of the grid in one slice.
+
+        Args:
+            left (int): The first column.
+            top (int): The first row.
+            right (int): The last column.
+            bottom (int): The last row.
+
+        Returns:
+            dict: The tile type by (x, y) position relative to (left, top), for every non-empty cell.
+        """
+        tiles, names, h = {}, self.type_names, self.grid_h
+        first_row, last_row = max(top, self.grid_y), min(bottom, self.grid_y + h - 1)
+        for x in range(max(left, self.grid_x), min(right, self.grid_x + self.grid_w - 1) + 1):
+            start = (x - self.grid_x) * h + first_row - self.grid_y
+            column = self.grid[start:start + last_row - first_row + 1]
+            if column.count(EMPTY) == len(column):
+                continue
+            for dy, tid in enumerate(column):
+                if tid:
+                    tiles[(x - left, first_row + dy - top)] = names[tid]
+        return tiles
+
+    def flood(self, pos):
+        """
+        Finds the cells connected to a grid position, left, right, up or down, that hold the same tile.
+
+        An empty cell is filled only as far as the grid reaches.
+
+        Args:
+            pos (tuple): The (x, y) grid position to start from.
+
+        Returns:
+            list: The (x, y) grid position of every cell in the area, or none if `pos` is outside the grid.
+        """
+        x, y = pos[0] - self.grid_x, pos[1] - self.grid_y
+        w, h, grid = self.grid_w, self.grid_h, self.grid
+        if not (0 <= x < w and 0 <= y < h):
+            return []
+        target = grid[x * h + y]
+        seen = bytearray(w * h)
+        seen[x * h + y] = 1
+        stack, found = [x * h + y], []
+        while stack:
+            i = stack.pop()
+            found.append((self.grid_x + i // h, self.grid_y + i % h))
+            column, row = divmod(i, h)
+            # Cells next to each other in a column are next to each other in the grid
+            for j, inside in ((i - 1, row > 0), (i + 1, row < h - 1), (i - h, column > 0), (i + h, column < w - 1)):
+                if inside and not seen[j] and grid[j] == target:
+                    seen[j] = 1
+                    stack.append(j)
+        return found
+
+    def _change_tile(self, i, x, y, old, tid):
+        """Writes a type id to grid index i at grid position (x, y), updating the caches and telling the listeners."""
+        self.grid[i] = tid
+        self.solid_cells[i] = self.solid[tid]
+        self.version += 1
+        self._invalidate(x, y, x, y, (old, tid))
+        if self.listeners:
+            pos, names = (x, y), self.type_names
+            for listener in self.listeners:
+                listener(pos, names[old], names[tid])
+
+    def subscribe(self, listener):
+        """
+        Calls a function after every change to a grid tile made with `set_tile()`, `remove_tile()` or `set_tiles()`.
+
+        Changes to the whole grid, like loading a map or moving a streamed window, are not reported
+        tile by tile. Caches built from the grid notice those by `version` changing.
+
+        Args:
+            listener (callable): Called with the (x, y) grid position, the old tile type and the new
+                one, where None stands for an empty cell.
+        """
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        """
+        Stops calling a function subscribed with `subscribe()`.
+
+        Args:
+            listener (callable): The function to stop calling.
+        """
+        self.listeners.remove(listener)
+
+    def iter_tiles(self):
+        """
+        Iterates over every non-empty grid cell.
+
+        Yields:
+            tuple: The (x, y) grid position and the tile type of each tile.
+        """
+        grid, h, names = self.grid, self.grid_h, self.type_names
+        for i, tid in enumerate(grid):
+            if tid:
+                yield (self.grid_x + i // h, self.grid_y + i % h), names[tid]
+
+    def find_tiles(self, tile_type):
+        """
+        Finds every grid tile of one type, scanning the grid bytes instead of visiting each cell.
+
+        On a streamed map the whole level file is searched, as saved on disk.
+
+        Args:
+            tile_type (str): The tile type to look for.
+
+        Returns:
+            list: The (x, y) grid position of each tile, in column order.
+        """
+        found = []
+        if self.level is not None:
+            names = self.level.type_names
+            return self.level.find(names.index(tile_type)) if tile_type in names else found
+        tid = self.type_ids.get(tile_type)
+        if tid is None:
+            return found
+        grid, h, needle = self.grid, self.grid_h, bytes((tid,))
+        i = grid.find(needle)
+        while i != -1:
+            found.append((self.grid_x + i // h, self.grid_y + i % h))
+            i = grid.find(needle, i + 1)
+        return found
+
+    def _invalidate(self, left, top, right, bottom, tids):
+        """Drops the baked chunks that the images of the given type ids cover when drawn anywhere in inclusive tile bounds."""
+        if not self.chunks:
+            return
+        self._update_images()
+        reach_x = max(self.extents[tid][0] for tid in tids)
+        reach_y = max(self.extents[tid][1] for tid in tids)
+        for cx in range(left // CHUNK_SIZE, (right + reach_x) // CHUNK_SIZE + 1):
+            for cy in range(top // CHUNK_SIZE, (bottom + reach_y) // CHUNK_SIZE + 1):
+                self.chunks.pop((cx, cy), None)
+
+    def invalidate_chunks(self):
+        """Drops every baked chunk so the whole map is rendered again from the grid."""
+        self.chunks.clear()
+
+    def _grow(self, left, top, right, bottom):
+        """Reallocates the grid so that it covers inclusive tile bounds, keeping the existing tiles."""
+        if self.grid_w == 0:
+            self._allocate(left - GRID_MARGIN, top - GRID_MARGIN, right + GRID_MARGIN, bottom + GRID_MARGIN)
+            return
+        old, old_x, old_y, old_h = self.grid, self.grid_x, self.grid_y, self.grid_h
+        old_w = self.grid_w
+        left = min(old_x, left - GRID_MARGIN if left < old_x else old_x)
+        top = min(old_y, top - GRID_MARGIN if top < old_y else old_y)
+        right = max(old_x + old_w - 1, right + GRID_MARGIN if right >= old_x + old_w else old_x)
+        bottom = max(old_y + old_h - 1, bottom + GRID_MARGIN if bottom >= old_y + old_h else old_y)
+        self._allocate(left, top, right, bottom)
+        dy = old_y - self.grid_y
+        for col in range(old_w):
+            start = (col + old_x - self.grid_x) * self.grid_h + dy
+            self.grid[start:start + old_h] = old[col * old_h:(col + 1) * old_h]
+        self._update_solid_cells()
+
+    def _allocate(self, left, top, right, bottom):
+        """Replaces the grid with an empty one covering the inclusive tile bounds given."""
+        self.grid_x, self.grid_y = left, top
+        self.grid_w, self.grid_h = right - left + 1, bottom - top + 1
+        self.grid = bytearray(self.grid_w * self.grid_h)
+        self._update_solid_cells()
+
+    def _update_solid_cells(self):
+        """Rebuilds the collision lookup after the grid was replaced, moved or resized."""
+        self.solid_cells = self.grid.translate(bytes(self.solid).ljust(256, b"\0"))
+        self.cell_rects.clear()
+        h = self.grid_h
+        self.neighbor_deltas = [(dx * h + dy, dx, dy) for dx, dy in NEIGHBOR_OFFSET]
+
     def tiles_around(self, pos):
         """
         Returns a list of tiles surrounding a specified position to check for collisions or interactions.
@@ -44,95 +617,516 @@ class Tilemap:
             pos (tuple): The position around which to check for surrounding tiles.
 
         Returns:
-            list: A list of tiles surrounding the specified position.
+            list: A list of (tile type, (x, y) grid position) tuples surrounding the specified position.
         """
         # Return a list of tiles surrounding a specific position to check for collisions or interactions
         tiles = []
-        tile_loc = (int(pos[0] // self.tile_size),
-                    int(pos[1] // self.tile_size))
+        grid, w, h, names = self.grid, self.grid_w, self.grid_h, self.type_names
+        tile_x = int(pos[0] // self.tile_size)
+        tile_y = int(pos[1] // self.tile_size)
+        x0 = tile_x - self.grid_x
+        y0 = tile_y - self.grid_y
 
         for offset in NEIGHBOR_OFFSET:
-            check_loc = str(tile_loc[0] + offset[0]) + \
-                ";" + str(tile_loc[1] + offset[1])
-            if check_loc in self.tilemap:
-                tiles.append(self.tilemap[check_loc])
+            x = x0 + offset[0]
+            y = y0 + offset[1]
+            if 0 <= x < w and 0 <= y < h:
+                tid = grid[x * h + y]
+                if tid:
+                    tiles.append((names[tid], (tile_x + offset[0], tile_y + offset[1])))
         return tiles
 
     def save(self, path):
         """
         Saves the current state of the tilemap to a file.
 
+        Paths ending in BINARY_MAP_EXTENSION are written in the binary format, anything else as JSON.
+        The file is replaced in one step, see `write_map()`.
+
         Args:
             path (str): The file path where the tilemap should be saved.
         """
-        # Save the current tilemap to a file for later use or level editing
-        with open(path, "w") as file:
-            json.dump({"tilemap": self.tilemap, "tilesize": self.tile_size,
-                      "offgrid": self.offgrid_tiles}, file)
+        write_map(self.snapshot(), path)
+
+    def save_binary(self, path):
+        """
+        Saves the tilemap in the binary map format, whatever the file extension.
+
+        The file is a BINARY_MAP_HEADER, then the type table (each name as a length byte and UTF-8 text,
+        for type ids 1 and up), then the grid as one type id byte per cell in column-major order, then
+        one BINARY_MAP_OFFGRID record per offgrid tile.
+
+        Args:
+            path (str): The file path where the tilemap should be saved.
+        """
+        write_map(self.snapshot(), path, binary=True)
+
+    def snapshot(self):
+        """
+        Copies everything `save()` writes, so it can be written on another thread while the map keeps changing.
+
+        The grid is copied in one piece, so taking a snapshot costs little more than the offgrid tiles.
+
+        Returns:
+            dict: The tile size, grid bounds, grid bytes, type names and offgrid tiles as (type id, x, y).
+        """
+        if self.level is not None:
+            raise ValueError("a streamed tilemap cannot be saved")
+        offgrid = [(self.type_id(tile["type"]), tile["pos"][0], tile["pos"][1]) for tile in self.offgrid_tiles]
+        return {"tile_size": self.tile_size, "grid_x": self.grid_x, "grid_y": self.grid_y,
+                "grid_w": self.grid_w, "grid_h": self.grid_h, "grid": bytes(self.grid),
+                "type_names": list(self.type_names), "offgrid": offgrid}
+
+    def _start_load(self, tile_size):
+        """Clears the per-map state before a new map is loaded."""
+        if self.level is not None:
+            self.level.close()
+            self.level = None
+            self.stream_edits = {}
+        self.tile_size = tile_size
+        self.tile_count = 0
+        self.version += 1
+        self.invalidate_chunks()
+        self.images, self.extents, self.overhang = [], [], (0, 0)
 
     def load(self, path):
         """
         Loads a tilemap from a specified file, including tiles and specific entity positions.
 
+        Both JSON maps and binary maps written by `save_binary` are accepted.
+
         Args:
             path (str): The file path from which to load the tilemap.
         """
+        with open(path, "rb") as f:
+            binary = f.read(len(BINARY_MAP_MAGIC)) == BINARY_MAP_MAGIC
+        if binary:
+            self.load_binary(path)
+            return
+
         # Load a tilemap from a file, including tiles and specific entity positions
         with open(path, "r") as f:
             file = json.load(f)
 
-            self.tilemap = file["tilemap"]
-            self.tile_size = file["tilesize"]
-            self.offgrid_tiles = file["offgrid"]
+        self._start_load(file["tilesize"])
+        for tile in file["offgrid"]:
+            tile["type"] = sys.intern(tile["type"])
+        self._index_offgrid(file["offgrid"])
+
+        # Size the grid once from the tile bounds instead of growing it tile by tile
+        positions = [tile["pos"] for tile in file["tilemap"].values()]
+        if positions:
+            self._allocate(min(p[0] for p in positions), min(p[1] for p in positions),
+                           max(p[0] for p in positions), max(p[1] for p in positions))
+        else:
+            self._allocate(0, 0, -1, -1)
+
+        for tile in file["tilemap"].values():
+            self.set_tile(tile["pos"], tile["type"])
+        self.randoms = [list(pos) for pos in self.find_tiles("random")]
+
+    def load_binary(self, path):
+        """
+        Loads a map in the binary format by memory mapping the file.
+
+        The grid is copied out of the mapping in one piece, so no Python object is created per tile.
+
+        Args:
+            path (str): The file path from which to load the tilemap.
+        """
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            header, names, offset = read_binary_header(data, path)
+            table = self._type_table(names)
+
+            self._start_load(header["tile_size"])
+            self.grid_x, self.grid_y = header["grid_x"], header["grid_y"]
+            self.grid_w, self.grid_h = header["grid_w"], header["grid_h"]
+            self.grid = bytearray(data[offset:offset + self.grid_w * self.grid_h].translate(table))
+            self.tile_count = len(self.grid) - self.grid.count(EMPTY)
+            self._update_solid_cells()
+            offset += self.grid_w * self.grid_h
+            self._index_offgrid(self._offgrid_records(data[offset:offset + header["offgrid_count"] * BINARY_MAP_OFFGRID.size], table))
+        self.randoms = [list(pos) for pos in self.find_tiles("random")]
+
+    def stream(self, level):
+        """
+        Plays a level streamed from disk instead of loading its whole grid.
+
+        The grid only holds a window of the level's column chunks, moved along with the camera by
+        `update_stream()`. Cells outside the window read as empty. Tile changes are remembered by
+        chunk, so they are still there when a chunk is streamed back in.
+
+        Args:
+            level (LevelStream): The opened level.
+        """
+        self._start_load(level.tile_size)
+        self.level = level
+        self.stream_table = self._type_table(level.type_names)
+        self._index_offgrid(self._offgrid_records(level.offgrid, self.stream_table))
+        self.grid_x, self.grid_y = level.grid_x, level.grid_y
+        self.grid_w, self.grid_h = 0, level.grid_h
+        self.grid = bytearray()
+        self._update_solid_cells()
+        self.window = (0, -1)
+        self.randoms = [list(pos) for pos in self.find_tiles("random")]
+
+    def update_stream(self, left, right):
+        """
+        Moves the streamed window so that it covers a range of the level, and reads ahead around it.
+
+        Args:
+            left (float): The leftmost x position in pixels that has to be loaded.
+            right (float): The rightmost x position in pixels that has to be loaded.
+        """
+        level = self.level
+        if not level.chunk_count:
+            return
+        # One column more on each side for the tiles around entities at the edge, and on the left
+        # enough to include tiles whose images reach into the range
+        self._update_images()
+        first = level.chunk_at(int(left // self.tile_size) - 1 - self.overhang[0])
+        last = level.chunk_at(int(right // self.tile_size) + 1)
+        if (first, last) != self.window:
+            self._move_window(first, last)
+
+        for step in range(1, STREAM_PREFETCH + 1):
+            level.request(first - step)
+            level.request(last + step)
+        level.discard(first - STREAM_PREFETCH, last + STREAM_PREFETCH)
+
+    def _move_window(self, first, last):
+        """Rebuilds the grid from the chunks first to last, reusing the ones already in the window."""
+        level, h = self.level, self.grid_h
+        old_first, old_last = self.window
+        span = level.chunk_columns * h
+        parts = []
+        for index in range(first, last + 1):
+            if old_first <= index <= old_last:
+                start = (index - old_first) * span
+                parts.append(self.grid[start:start + level.chunk_columns_of(index)[1] * h])
+            else:
+                parts.append(self._stream_in(index))
 
-            for x in file["tilemap"]:
-                if file["tilemap"][x]["type"] == "random":
-                    self.randoms.append(file["tilemap"][x]["pos"])
+        self.grid = bytearray().join(parts)
+        self.grid_x = level.chunk_columns_of(first)[0]
+        self.grid_w = len(self.grid) // h if h else 0
+        self.tile_count = len(self.grid) - self.grid.count(EMPTY)
+        self.window = (first, last)
+        self.version += 1
+        self._update_solid_cells()
+
+        # Drop the baked chunks over every stream chunk that came in or went out
+        self._update_images()
+        changed = set(range(first, last + 1)) ^ set(range(old_first, old_last + 1))
+        for index in changed:
+            x, columns = level.chunk_columns_of(index)
+            low, high = x // CHUNK_SIZE, (x + columns - 1 + self.overhang[0]) // CHUNK_SIZE
+            for key in [key for key in self.chunks if low <= key[0] <= high]:
+                del self.chunks[key]
+
+    def _stream_in(self, index):
+        """Returns the grid bytes of a chunk in this tilemap's type ids, with earlier tile changes applied."""
+        chunk = bytearray(self.level.take(index).translate(self.stream_table))
+        x, _ = self.level.chunk_columns_of(index)
+        for (ex, ey), tid in self.stream_edits.get(index, {}).items():
+            if 0 <= ey - self.grid_y < self.grid_h:
+                chunk[(ex - x) * self.grid_h + ey - self.grid_y] = tid
+        return chunk
+
+    def _streamed_tile(self, x, y):
+        """Returns the type id of a cell outside the streamed window, as saved with any later changes applied."""
+        edits = self.stream_edits.get((x - self.level.grid_x) // self.level.chunk_columns, {})
+        if (x, y) in edits:
+            return edits[(x, y)]
+        return self.stream_table[self.level.cell(x, y)]
+
+    def _record_edit(self, x, y, tid):
+        """Remembers a tile change on a streamed map, so it survives the chunk being streamed out."""
+        index = (x - self.level.grid_x) // self.level.chunk_columns
+        if 0 <= index < self.level.chunk_count:
+            self.stream_edits.setdefault(index, {})[(x, y)] = tid
+
+    def _type_table(self, names):
+        """Returns a bytes.translate table mapping the type ids of a binary map, given their names, onto this tilemap's ids."""
+        table = bytearray(256)
+        for file_id, name in enumerate(names):
+            if name is not None:
+                table[file_id] = self.type_id(name)
+        return bytes(table)
+
+    def _offgrid_records(self, records, table):
+        """Returns the offgrid tiles stored in packed BINARY_MAP_OFFGRID records, as dictionaries."""
+        names = self.type_names
+        return [{"type": names[table[tid]], "pos": [x, y]} for tid, x, y in BINARY_MAP_OFFGRID.iter_unpack(records)]
+
+    def _index_offgrid(self, tiles):
+        """Replaces the offgrid tiles and rebuilds their bucket index."""
+        self.offgrid_tiles = tiles
+        self.offgrid_buckets = {}
+        self.offgrid_order = 0
+        for tile in tiles:
+            self._bucket_offgrid(tile)
+
+    def _bucket_offgrid(self, tile):
+        """Adds an offgrid tile to the bucket of its top left corner, after every tile added before it."""
+        key = (int(tile["pos"][0] // OFFGRID_BUCKET_SIZE), int(tile["pos"][1] // OFFGRID_BUCKET_SIZE))
+        self.offgrid_buckets.setdefault(key, []).append((self.offgrid_order, tile))
+        self.offgrid_order += 1
+        if tile["type"] not in self.offgrid_sizes:
+            self.offgrid_sizes[tile["type"]] = None
+
+    def add_offgrid(self, tile_type, pos):
+        """
+        Places a tile outside the grid, drawn over the offgrid tiles placed before it.
+
+        Args:
+            tile_type (str): The tile type to place.
+            pos (tuple): The (x, y) position in pixels of its top left corner.
+
+        Returns:
+            dict: The new tile.
+        """
+        tile = {"type": sys.intern(tile_type), "pos": pos}
+        self.offgrid_tiles.append(tile)
+        self._bucket_offgrid(tile)
+        return tile
+
+    def remove_offgrid(self, tile):
+        """
+        Removes an offgrid tile.
+
+        Args:
+            tile (dict): The tile, as found by `offgrid_in()` or `offgrid_at()`.
+        """
+        key = (int(tile["pos"][0] // OFFGRID_BUCKET_SIZE), int(tile["pos"][1] // OFFGRID_BUCKET_SIZE))
+        bucket = self.offgrid_buckets[key]
+        for i, (_, other) in enumerate(bucket):
+            if other is tile:
+                del bucket[i]
+                break
+        if not bucket:
+            del self.offgrid_buckets[key]
+        for i, other in enumerate(self.offgrid_tiles):
+            if other is tile:
+                del self.offgrid_tiles[i]
+                break
+
+    def _update_offgrid_sizes(self):
+        """Looks up the image size of any offgrid tile type added since the last call. The undrawn ENTITY_TILES take one tile."""
+        missing = [tile_type for tile_type, size in self.offgrid_sizes.items() if size is None]
+        if not missing:
+            return
+        for tile_type in missing:
+            if tile_type in ENTITY_TILES:
+                self.offgrid_sizes[tile_type] = (self.tile_size, self.tile_size)
+            else:
+                self.offgrid_sizes[tile_type] = self.game.assets[tile_type].get_size()
+        self.offgrid_reach = (max(size[0] for size in self.offgrid_sizes.values()),
+                              max(size[1] for size in self.offgrid_sizes.values()))
+
+    def offgrid_in(self, area, include_markers=False):
+        """
+        Finds the offgrid tiles whose images overlap an area, looking only in the buckets around it.
+
+        Args:
+            area (pygame.Rect): The area in pixels.
+            include_markers (bool, optional): Whether to also find the spawn markers listed in ENTITY_TILES,
+                which are never drawn, as one tile each. Defaults to False.
+
+        Returns:
+            list: The tiles, in the order they are drawn.
+        """
+        self._update_offgrid_sizes()
+        sizes, buckets = self.offgrid_sizes, self.offgrid_buckets
+        left, top, right, bottom = area.left, area.top, area.right, area.bottom
+        # Tiles are bucketed by their top left corner, so look far enough up and left to find any image reaching in
+        found = []
+        for bx in range(int((left - self.offgrid_reach[0]) // OFFGRID_BUCKET_SIZE), int((right - 1) // OFFGRID_BUCKET_SIZE) + 1):
+            for by in range(int((top - self.offgrid_reach[1]) // OFFGRID_BUCKET_SIZE), int((bottom - 1) // OFFGRID_BUCKET_SIZE) + 1):
+                for order, tile in buckets.get((bx, by), ()):
+                    if not include_markers and tile["type"] in ENTITY_TILES:
+                        continue
+                    x, y = tile["pos"]
+                    w, h = sizes[tile["type"]]
+                    if x < right and x + w > left and y < bottom and y + h > top:
+                        found.append((order, tile))
+        found.sort(key=lambda entry: entry[0])
+        return [tile for _, tile in found]
+
+    def offgrid_at(self, pos, include_markers=False):
+        """
+        Finds the offgrid tiles whose images cover a point.
+
+        Args:
+            pos (tuple): The (x, y) position in pixels.
+            include_markers (bool, optional): Whether to also find the spawn markers listed in ENTITY_TILES.
+                Defaults to False.
+
+        Returns:
+            list: The tiles, in the order they are drawn.
+        """
+        return [tile for tile in self.offgrid_in(pg.Rect(int(pos[0]) - 1, int(pos[1]) - 1, 3, 3), include_markers)
+                if pg.Rect(tile["pos"], self.offgrid_sizes[tile["type"]]).collidepoint(pos)]
 
     def physics_rects_around(self, pos):
         """
         Generates a list of pygame.Rect objects for physics interactions near a given position.
 
+        Solid cells are looked up in `solid_cells` and every cell's rect is created once and then
+        reused, so a query allocates nothing once the cells around it have been seen.
+
         Args:
             pos (tuple): The position around which to check for physics interaction tiles.
 
         Returns:
             list: A list of pygame.Rect objects representing tiles that interact with physics.
+                The list and the rects are shared, only valid until the next call and must not be modified.
         """
         # Generate a list of pygame.Rects for physics interactions near a given position
-        rects = []
-        for tile in self.tiles_around(pos):
-            if tile["type"] in PHYSICS_TILES:
-                rects.append(pg.Rect(tile["pos"][0] * self.tile_size, tile["pos"]
-                             [1] * self.tile_size, self.tile_size, self.tile_size))
+        rects = self.physics_rects
+        rects.clear()
+        solid, cached = self.solid_cells, self.cell_rects
+        w, h, size = self.grid_w, self.grid_h, self.tile_size
+        x0 = int(pos[0] // size) - self.grid_x
+        y0 = int(pos[1] // size) - self.grid_y
+        base = x0 * h + y0
+        # Away from the grid edges every neighbor is inside, so the bounds checks can be skipped
+        inside = 1 <= x0 < w - 1 and 1 <= y0 < h - 2
+
+        for delta, dx, dy in self.neighbor_deltas:
+            if not inside and not (0 <= x0 + dx < w and 0 <= y0 + dy < h):
+                continue
+            i = base + delta
+            if solid[i]:
+                rect = cached.get(i)
+                if rect is None:
+                    rect = cached[i] = pg.Rect((self.grid_x + x0 + dx) * size, (self.grid_y + y0 + dy) * size, size, size)
+                rects.append(rect)
         return rects
 
+    def physics_rects_in(self, area, bottom_up=False):
+        """
+        Returns the rects of the physics tiles overlapping an area, like the box an entity sweeps in one move.
+
+        Only the cells under the area are looked at, however big it is, so the query fits the
+        entity and its speed instead of a fixed neighborhood. Rects come row by row, left to right
+        within a row.
+
+        Args:
+            area (pygame.Rect): The area in pixels.
+            bottom_up (bool, optional): Whether to start from the bottom row instead of the top one,
+                so an entity moving up meets the tiles nearest to it first. Defaults to False.
+
+        Returns:
+            list: The pygame.Rect of every physics tile overlapping the area. The list and the rects are
+                shared with `physics_rects_around()`, only valid until the next call and must not be modified.
+        """
+        rects = self.physics_rects
+        rects.clear()
+        solid, cached = self.solid_cells, self.cell_rects
+        h, size = self.grid_h, self.tile_size
+        left = max(area.left // size - self.grid_x, 0)
+        right = min((area.right - 1) // size - self.grid_x, self.grid_w - 1)
+        top = max(area.top // size - self.grid_y, 0)
+        bottom = min((area.bottom - 1) // size - self.grid_y, h - 1)
+
+        for y in (range(bottom, top - 1, -1) if bottom_up else range(top, bottom + 1)):
+            for x in range(left, right + 1):
+                i = x * h + y
+                if solid[i]:
+                    rect = cached.get(i)
+                    if rect is None:
+                        rect = cached[i] = pg.Rect((self.grid_x + x) * size, (self.grid_y + y) * size, size, size)
+                    rects.append(rect)
+        return rects
+
+    def _update_images(self):
+        """Looks up the image and extents of any tile type registered since the last call."""
+        size = self.tile_size
+        for tid in range(len(self.images), len(self.type_names)):
+            img = None
+            if tid != EMPTY and not self.hidden[tid]:
+                img = self.game.assets.get(self.type_names[tid])
+            self.images.append(img)
+            if img is None:
+                self.extents.append((0, 0))
+            else:
+                self.extents.append((-(-img.get_width() // size) - 1, -(-img.get_height() // size) - 1))
+                self.overhang = (max(self.overhang[0], self.extents[tid][0]),
+                                 max(self.overhang[1], self.extents[tid][1]))
+
+    def _bake_chunk(self, cx, cy):
+        """
+        Draws every grid tile that shows up inside a chunk onto a new surface.
+
+        Args:
+            cx (int): The chunk column.
+            cy (int): The chunk row.
+
+        Returns:
+            pygame.Surface: The baked chunk, or None if no tile is drawn in it.
+        """
+        grid, h, solid, images = self.grid, self.grid_h, self.solid, self.images
+        size = self.tile_size
+        left, top = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+        chunk = None
+
+        # Tiles up to `overhang` cells to the left or above can have images reaching into this chunk
+        x_start = max(left - self.overhang[0], self.grid_x)
+        x_end = min(left + CHUNK_SIZE, self.grid_x + self.grid_w)
+        y_start = max(top - self.overhang[1], self.grid_y)
+        y_end = min(top + CHUNK_SIZE, self.grid_y + self.grid_h)
+
+        for x in range(x_start, x_end):
+            column = (x - self.grid_x) * h - self.grid_y
+            draw_x = (x - left) * size
+            for y in range(y_start, y_end):
+                tid = grid[column + y]
+                if images[tid] is None:
+                    continue  # Empty cells and entity spawn points have no image
+                if chunk is None:
+                    chunk = pg.Surface((CHUNK_SIZE * size, CHUNK_SIZE * size))
+                    chunk.fill(CHUNK_COLORKEY)
+                draw_y = (y - top) * size
+                if solid[tid]:
+                    pg.draw.rect(chunk, (0, 0, 0), (draw_x, draw_y, size, size))
+                chunk.blit(images[tid], (draw_x, draw_y))
+
+        if chunk is not None:
+            chunk.set_colorkey(CHUNK_COLORKEY, pg.RLEACCEL)
+        return chunk
+
     def render(self, surf, offset=(0, 0)):
         """
         Renders the tilemap and entities onto a given surface, applying an offset for scrolling.
 
+        Grid tiles are drawn from chunk surfaces that are baked the first time they come into view
+        and rebaked only after a tile inside them changes. Only the offgrid tiles overlapping the view are drawn.
+
         Args:
             surf (pygame.Surface): The surface to render the tilemap on.
             offset (tuple): The offset to apply to the tilemap rendering, typically used for scrolling.
         """
         # Render the tilemap and entities onto a given surface, applying an offset for scrolling
-        for tile in self.offgrid_tiles:
-            if tile["type"] == "koopa" or tile["type"] == "goomba":
-                continue  # Exclude enemy entities from general tile rendering
+        # Enemy spawn markers in ENTITY_TILES are left out by offgrid_in()
+        for tile in self.offgrid_in(surf.get_rect(topleft=offset)):
             surf.blit(self.game.assets[tile["type"]], (tile["pos"]
                       [0] - offset[0], tile["pos"][1] - offset[1]))
 
-        for x in range(offset[0] // self.tile_size, (offset[0] + surf.get_width()) // self.tile_size + 1):
-            for y in range(offset[1] // self.tile_size, (offset[1] + surf.get_height()) // self.tile_size + 1):
-                loc = str(x) + ";" + str(y)
-                if loc in self.tilemap:
-                    tile = self.tilemap[loc]
-                    if tile["type"] == "goomba" or tile["type"] == "koopa":
-                        continue  # Again, exclude specific entities to handle them differently
-                    if tile["type"] in PHYSICS_TILES:
-                        pg.draw.rect(surf, (0, 0, 0), (tile["pos"][0] * self.tile_size - offset[0],
-                                     tile["pos"][1] * self.tile_size - offset[1], self.tile_size, self.tile_size))
-                    surf.blit(self.game.assets[tile["type"]], (
-                        tile["pos"][0] * self.tile_size - offset[0], tile["pos"][1] * self.tile_size - offset[1]))
+        self._update_images()
+        chunks = self.chunks
+        span = CHUNK_SIZE * self.tile_size
+        for cx in range(offset[0] // span, (offset[0] + surf.get_width() - 1) // span + 1):
+            for cy in range(offset[1] // span, (offset[1] + surf.get_height() - 1) // span + 1):
+                key = (cx, cy)
+                if key in chunks:
+                    chunks.move_to_end(key)
+                    chunk = chunks[key]
+                else:
+                    chunk = chunks[key] = self._bake_chunk(cx, cy)
+                    if len(chunks) > CHUNK_CACHE_SIZE:
+                        chunks.popitem(last=False)
+                if chunk is not None:
+                    surf.blit(chunk, (cx * span - offset[0], cy * span - offset[1]))
 
         self.initial_render = False  # Mark that the initial rendering has been completed
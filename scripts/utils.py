@@ -1,11 +1,71 @@
 import pygame as pg
 import os
+from collections.abc import Mapping
 
 BASE_IMG_PATH = "images/" # Path to folder containing all images
 
+# Every asset used by the game and the editor, loaded on first use by AssetRegistry.
+# "image" loads one file, "images" loads a whole folder and "animation" wraps a folder in an Animation.
+ASSET_MANIFEST = {
+    "brick": {"image": "brick.png"},
+    "ground": {"image": "ground.png"},
+    "bush1": {"image": "another/bush.png"},
+    "bush2": {"image": "another/bush2.png"},
+    "bush3": {"image": "another/bush3.png"},
+    "bushes": {"image": "another/bushes.png"},
+    "flower1": {"image": "flower/flower1.png"},
+    "flower2": {"image": "flower/flower2.png"},
+    "flower3": {"image": "flower/flower3.png"},
+    "flower4": {"image": "flower/flower4.png"},
+    "background": {"image": "another/color.png"},
+    "clouds": {"images": "another/clouds"},
+    "coin": {"animation": "coins"},
+    "random": {"image": "another/random/random.png"},
+    "random2": {"image": "another/random/random3.png"},
+    "sizeup/small/idle": {"animation": "sizeup/small"},
+
+    "player/small/idle": {"animation": "mario/small/right/idle", "img_dur": 4},
+    "player/small/run": {"animation": "mario/small/right/run", "img_dur": 4},
+    "player/small/jump": {"animation": "mario/small/jump", "img_dur": 4},
+    "player/big/idle": {"animation": "mario/big/right/idle", "img_dur": 4},
+    "player/big/run": {"animation": "mario/big/right/run", "img_dur": 4},
+    "player/big/jump": {"animation": "mario/big/jump", "img_dur": 4},
+
+    "goomba": {"image": "goomba/run/goombs1.png"},
+    "goomba/run": {"animation": "goomba/move", "img_dur": 10, "colorkey": (0, 255, 0)},
+
+    "koopa": {"image": "koopa/right/run/koopa.png"},
+    "koopa/run": {"animation": "koopa/right/run", "img_dur": 6},
+    "shell/shell": {"animation": "koopa/dead", "img_dur": 10},
+
+    "castle": {"image": "castle/castle-1.png", "colorkey": (0, 255, 0)},
+    "flag": {"image": "flag1.png"},
+    "victory": {"image": "sizeup/small/01sizeup.png"},
+}
+
+_image_cache = {}  # Loaded images keyed by (path, colorkey)
+_decoded = {}  # Images decoded by decode_image() and not converted yet, keyed by path
+
+
+def decode_image(path):
+    """
+    Decodes an image file ahead of time, for `load_image()` to pick up.
+
+    Decoding does not need the display, so unlike `load_image()` this can run on any thread.
+
+    Args:
+        path (str): The path to the image relative to the base image path.
+    """
+    _decoded[path] = pg.image.load(BASE_IMG_PATH + path)
+
+
+
 def load_image(path, colorkey=(0, 0, 0)):
     """
     Loads a single image from a specified path, applying a color key for transparency.
+
+    Images are converted to the display's pixel format with an RLE accelerated colorkey and cached,
+    so every file is decoded at most once. The returned surface is shared and must not be modified.
     
     Args:
         path (str): The path to the image relative to the base image path.
@@ -14,8 +74,15 @@ def load_image(path, colorkey=(0, 0, 0)):
     Returns:
         pygame.Surface: The loaded image with the colorkey applied.
     """
-    img = pg.image.load(BASE_IMG_PATH + path).convert()
-    img.set_colorkey(colorkey)
+    key = (path, colorkey)
+    img = _image_cache.get(key)
+    if img is None:
+        img = _decoded.pop(path, None)
+        if img is None:
+            img = pg.image.load(BASE_IMG_PATH + path)
+        img = img.convert()
+        img.set_colorkey(colorkey, pg.RLEACCEL)
+        _image_cache[key] = img
     return img
 
 def load_images(path, colorkey=(0, 0, 0)):
@@ -34,16 +101,112 @@ def load_images(path, colorkey=(0, 0, 0)):
         images.append(load_image(path + '/' + img_name, colorkey))
     return images
 
+
+class AssetRegistry(Mapping):
+    """
+    A read-only mapping from asset names to loaded assets, loading each one the first time it is used.
+
+    Attributes:
+        manifest (dict): The asset specs by name, in the ASSET_MANIFEST format.
+        loaded (dict): The assets loaded so far.
+    """
+
+    def __init__(self, manifest=ASSET_MANIFEST):
+        """
+        Initializes the registry without loading anything.
+
+        Args:
+            manifest (dict, optional): The asset specs by name. Defaults to ASSET_MANIFEST.
+        """
+        self.manifest = manifest
+        self.loaded = {}
+
+    def __getitem__(self, name):
+        asset = self.loaded.get(name)
+        if asset is None:
+            asset = self.loaded[name] = self._load(self.manifest[name])
+        return asset
+
+    def __iter__(self):
+        return iter(self.manifest)
+
+    def __len__(self):
+        return len(self.manifest)
+
+    def pending_files(self):
+        """
+        Lists the image files of every asset not loaded yet.
+
+        Returns:
+            list: The paths relative to the base image path.
+        """
+        files = []
+        for name, spec in self.manifest.items():
+            if name in self.loaded:
+                continue
+            if "image" in spec:
+                files.append(spec["image"])
+            else:
+                folder = spec.get("images") or spec["animation"]
+                files += [folder + '/' + img_name for img_name in sorted(os.listdir(BASE_IMG_PATH + folder))]
+        return list(dict.fromkeys(files))  # Some files are used by more than one asset
+
+    def preload(self):
+        """Loads every asset not loaded yet, using the images decoded by `decode_image()` where there are any."""
+        for name in self:
+            self[name]
+        _decoded.clear()
+
+    def _load(self, spec):
+        """Loads one asset from its manifest spec."""
+        colorkey = spec.get("colorkey", (0, 0, 0))
+        if "image" in spec:
+            return load_image(spec["image"], colorkey)
+        if "images" in spec:
+            return load_images(spec["images"], colorkey)
+        return Animation(load_images(spec["animation"], colorkey), img_dur=spec.get("img_dur", 5))
+
+
+assets = AssetRegistry()
+"""The asset registry shared by the game and the editor."""
+
+
+class AnimationClock:
+    """
+    A frame counter that several animations can follow instead of keeping their own.
+
+    Animations created with `Animation.copy(clock)` all show the same frame, so a crowd of mobs
+    animates in lockstep and only the clock has to be advanced each tick.
+
+    Attributes:
+        ticks (int): The number of ticks since the clock was created.
+    """
+
+    def __init__(self):
+        """Initializes a new AnimationClock at tick 0."""
+        self.ticks = 0
+
+    def update(self):
+        """Advances the clock by one tick."""
+        self.ticks += 1
+
+
 class Animation:
     """
     Represents an animation sequence composed of multiple images.
-    
+
+    Horizontally flipped frames and the frame-to-image lookup table are built once when the
+    animation is loaded and shared by every copy, so getting the current image never allocates.
+
     Attributes:
         images (list): A list of pygame.Surface objects representing the animation frames.
+        flipped (list): The same frames flipped horizontally.
+        index (list): The image index to show for every frame.
         img_duration (int): The duration each frame is displayed for.
         loop (bool): Whether the animation should loop.
         done (bool): Whether the animation has completed (relevant for non-looping animations).
         frame (int): The current frame index of the animation.
+        clock (AnimationClock): The clock the animation follows, or None if it keeps its own frame count.
     """
     
     def __init__(self, images, img_dur=5, loop=True):
@@ -56,38 +219,65 @@ class Animation:
             loop (bool): Whether the animation should loop.
         """
         self.images = images
+        self.flipped = [pg.transform.flip(img, True, False) for img in images]
+        self.index = [frame // img_dur for frame in range(img_dur * len(images))]
         self.loop = loop
         self.img_duration = img_dur
         self.done = False
         self.frame = 0
+        self.clock = None
+        self.start = 0
 
-    def copy(self):
+    def copy(self, clock=None):
         """
-        Creates a copy of the animation.
-        
+        Creates a copy of the animation that shares its frames and lookup table.
+
+        Args:
+            clock (AnimationClock, optional): A shared clock for the copy to follow instead of counting its own frames.
+
         Returns:
             Animation: A new Animation instance with the same images, duration, and loop setting.
         """
-        return Animation(self.images, self.img_duration, self.loop)
+        # Copy the attributes directly so the flipped frames and lookup table are not rebuilt
+        anim = Animation.__new__(Animation)
+        anim.__dict__.update(self.__dict__)
+        anim.done = False
+        anim.frame = 0
+        anim.clock = clock
+        anim.start = clock.ticks if clock is not None else 0
+        return anim
 
     def update(self):
         """
         Updates the animation frame, advancing the animation or marking it as done if not looping.
         """
-        if self.loop:
-            self.frame = (
-                self.frame + 1) % (self.img_duration * len(self.images))
+        length = len(self.index)
+        if self.clock is not None:
+            # Looping animations read the clock in img(), only one-shot ones keep track of their frame
+            if not self.loop:
+                self.frame = min(self.clock.ticks - self.start, length - 1)
+                self.done = self.frame >= length - 1
+        elif self.loop:
+            self.frame = (self.frame + 1) % length
         else:
-            self.frame = min(
-                self.frame + 1, self.img_duration * len(self.images) - 1)
-            if self.frame >= self.img_duration * len(self.images) - 1:
+            self.frame = min(self.frame + 1, length - 1)
+            if self.frame >= length - 1:
                 self.done = True
 
-    def img(self):
+    def img(self, flip=False):
         """
         Gets the current frame of the animation.
-        
+
+        Args:
+            flip (bool, optional): Whether to get the horizontally flipped frame.
+
         Returns:
             pygame.Surface: The current frame's image.
         """
-        return self.images[int(self.frame / self.img_duration)]
+        frame = self.frame
+        if self.clock is not None and self.loop:
+            # Use the absolute tick so every follower of the clock stays in step, even without update()
+            frame = self.clock.ticks % len(self.index)
+        if flip:
+            return self.flipped[self.index[frame]]
+        return self.images[self.index[frame]]
@@ -0,0 +1,41 @@
+import pytest
+
+from main import Game
+from scripts.batch import BATCH_TYPES
+
+np = pytest.importorskip("numpy")
+
+
+def solid_grid(tilemap):
+    """Returns the tilemap's solid cells as the boolean grid MobBatch keeps."""
+    return np.frombuffer(tilemap.solid_cells, dtype=np.uint8).reshape(tilemap.grid_w, tilemap.grid_h).astype(bool)
+
+
+def batched_game():
+    """Creates a headless game on map1 with batched mob physics and every mob spawned."""
+    game = Game("maps/map1.json", headless=True, batch_physics=True)
+    game.spawn_mobs(float("-inf"), float("inf"))
+    return game, [mob for mob in game.harmfull_mobs if mob.type in BATCH_TYPES]
+
+
+def test_tile_changes_before_the_first_step():
+    # The solid grid is only built by the first step, so bumping blocks before it must not touch it
+    game, mobs = batched_game()
+    assert game.batch.solid is None
+    for block in list(game.interactive.values()):
+        block.activate()
+    ground = next(pos for pos, tile_type in game.tilemap.iter_tiles() if tile_type == "ground")
+    game.tilemap.remove_tile(ground)
+
+    game.batch.step(mobs)
+    assert (game.batch.solid == solid_grid(game.tilemap)).all()
+
+
+def test_tile_change_after_the_first_step():
+    game, mobs = batched_game()
+    game.batch.step(mobs)
+    ground = next(pos for pos, tile_type in game.tilemap.iter_tiles() if tile_type == "ground")
+    game.tilemap.remove_tile(ground)
+
+    assert game.batch.version == game.tilemap.version  # Applied as it happened, not left for a rebuild
+    assert (game.batch.solid == solid_grid(game.tilemap)).all()